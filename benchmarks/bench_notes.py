@@ -0,0 +1,138 @@
+"""Notes query latency benchmark at growing table sizes.
+
+Fills a temporary, fully migrated database with synthetic tasks and times the
+src/notes.py helpers behind /list, /update, /edit and /remove, with and without
+the tasks lookup index. Large sizes take a while to build (10M rows is a few
+minutes and about 1 GB of temporary disk).
+
+Usage (from the repository root):
+    python -m benchmarks.bench_notes --rows 10000,1000000,10000000
+    python -m benchmarks.bench_notes --rows 10000 --queries 2000
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src import notes
+from src.db import Database
+from src.migrations import migrate
+
+USERS = 10000
+GUILDS = 100
+DAYS = 365
+INSERT_CHUNK = 100000
+START_DATE = date(2025, 1, 1)
+
+
+def task_rows(count, rng):
+    statuses = list(notes.status_emojis)
+    for i in range(count):
+        yield (f"task {i}", rng.randrange(USERS), (START_DATE + timedelta(days=rng.randrange(DAYS))).isoformat(),
+               rng.choice(statuses), rng.randrange(GUILDS))
+
+
+def build(database, rows, seed=1):
+    """Migrate the database and insert rows synthetic tasks; returns the build time in seconds."""
+    started = time.perf_counter()
+    migrate(database)
+    conn = database.connection()
+    # Bulk load without the index and rebuild it once at the end, which is much faster
+    conn.execute("DROP INDEX idx_tasks_user_date_guild")
+    conn.execute("PRAGMA synchronous = OFF")
+    rng = random.Random(seed)
+    generator = task_rows(rows, rng)
+    with conn:
+        while True:
+            chunk = [row for _, row in zip(range(INSERT_CHUNK), generator)]
+            if not chunk:
+                break
+            conn.executemany("INSERT INTO tasks (task, user_id, date, status, guild_id) VALUES (?, ?, ?, ?, ?)", chunk)
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return time.perf_counter() - started
+
+
+def sample_targets(conn, count, rng):
+    """Pick count existing (id, user_id, date, guild_id) rows to query."""
+    max_id = conn.execute("SELECT max(id) FROM tasks").fetchone()[0]
+    targets = []
+    while len(targets) < count:
+        row = conn.execute("SELECT id, user_id, date, guild_id FROM tasks WHERE id = ?", (rng.randint(1, max_id),)).fetchone()
+        if row is not None:
+            targets.append(row)
+    return targets
+
+
+def time_query(fn, targets):
+    """Median and 95th percentile latency of fn(target) in microseconds."""
+    samples = []
+    for target in targets:
+        started = time.perf_counter()
+        fn(target)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def measure(conn, targets):
+    def list_tasks(target):
+        notes.get_tasks_by_user(conn, target[1], target[2], target[3])
+
+    def update_status(target):
+        with conn:
+            notes.update_task_status(conn, target[0], 'completed', user_id=target[1])
+
+    def edit(target):
+        with conn:
+            notes.edit_task_from_db(conn, target[1], target[0], 'edited')
+
+    def add_and_remove(target):
+        with conn:
+            notes.add_task_to_db(conn, 'bench', target[1], target[2], guild_id=target[3])
+            task_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            notes.remove_task_from_db(conn, target[1], task_id)
+
+    # /update, /remove and /edit list the day's tasks first, then act on one by id
+    return {
+        'list': time_query(list_tasks, targets),
+        'update': time_query(update_status, targets),
+        'edit': time_query(edit, targets),
+        'add+remove': time_query(add_and_remove, targets),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,1000000,10000000', help='comma-separated table sizes')
+    parser.add_argument('--queries', type=int, default=500, help='timed calls per query and size')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(f"{'rows':>10} {'index':>6} {'query':>11} {'median us':>10} {'p95 us':>10}")
+    for rows in (int(n) for n in args.rows.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            database = Database(os.path.join(tmp, 'tasks.db'))
+            build_seconds = build(database, rows)
+            conn = database.connection()
+            targets = sample_targets(conn, args.queries, random.Random(2))
+
+            for indexed in (False, True):
+                if indexed:
+                    started = time.perf_counter()
+                    conn.execute("CREATE INDEX idx_tasks_user_date_guild ON tasks (user_id, date, guild_id, status, task)")
+                    index_seconds = time.perf_counter() - started
+                # Full scans get slow quickly; keep the unindexed runs short
+                sample = targets if indexed or rows <= 100000 else targets[:max(10, args.queries // 50)]
+                for query, (median, p95) in measure(conn, sample).items():
+                    print(f"{rows:>10} {'yes' if indexed else 'no':>6} {query:>11} {median:>10.1f} {p95:>10.1f}")
+            print(f"{rows:>10} built in {build_seconds:.1f}s, index in {index_seconds:.1f}s, "
+                  f"file {os.path.getsize(database.path) / 2**20:.0f} MB")
+            database.close()
+
+
+if __name__ == '__main__':
+    main()
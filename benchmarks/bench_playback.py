@@ -0,0 +1,265 @@
+"""Voice playback benchmark for MusicCog.
+
+Drives MusicCog.play_music/play_next for a growing number of simulated guilds
+against a stub voice client and locally generated WAV files, so neither Discord
+nor YouTube is involved. FFmpeg must be on PATH.
+
+Python allocations are only traced with --memory, in a separate pass after each
+timed round, since tracing slows every allocation and would inflate the CPU numbers.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_playback --guilds 1,5,10,25 --duration 15
+    python -m benchmarks.bench_playback --mode pcm --memory
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import resource
+import shutil
+import statistics
+import struct
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from types import SimpleNamespace
+
+import discord
+
+import src.music as music
+from src.music import MusicCog, Track
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+LAG_PROBE_INTERVAL = 0.05
+
+
+def generate_tone(path, seconds, frequency=440.0):
+    """Write a 48kHz stereo 16-bit sine tone, the format Discord expects."""
+    frame = struct.Struct('<hh')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        chunk = bytearray()
+        for i in range(int(seconds * SAMPLE_RATE)):
+            sample = int(8000 * math.sin(2 * math.pi * frequency * i / SAMPLE_RATE))
+            chunk += frame.pack(sample, sample)
+            if len(chunk) >= 1 << 20:
+                wav.writeframes(chunk)
+                chunk.clear()
+        wav.writeframes(chunk)
+
+
+class FakeVoiceClient:
+    """Stands in for discord.VoiceClient: paces source.read() every 20ms like AudioPlayer."""
+    def __init__(self, channel):
+        self.channel = channel
+        self.frame_times = []
+        self._encoder = discord.opus.Encoder() if discord.opus.is_loaded() else None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive() and self._resumed.is_set()
+
+    def is_paused(self):
+        return self._thread is not None and self._thread.is_alive() and not self._resumed.is_set()
+
+    def play(self, source, *, after=None):
+        self._stopped = threading.Event()
+        self._resumed.set()
+        self._thread = threading.Thread(target=self._run, args=(source, after, self._stopped), daemon=True)
+        self._thread.start()
+
+    def _run(self, source, after, stopped):
+        next_frame = time.perf_counter()
+        while not stopped.is_set():
+            if not self._resumed.is_set():
+                self._resumed.wait()
+                next_frame = time.perf_counter()
+                continue
+            data = source.read()
+            if not data:
+                break
+            # Mirror the real player: non-Opus sources are encoded in Python
+            if self._encoder is not None and not source.is_opus():
+                self._encoder.encode(data, self._encoder.SAMPLES_PER_FRAME)
+            self.frame_times.append(time.perf_counter())
+            next_frame += FRAME_SECONDS
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+        source.cleanup()
+        if after is not None:
+            after(None)
+
+    def stop(self):
+        self._stopped.set()
+        self._resumed.set()
+
+    def pause(self):
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, force=False):
+        self.stop()
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild_id):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.client = None
+
+    async def connect(self):
+        self.client = FakeVoiceClient(self)
+        return self.client
+
+
+async def probe_loop_lag(stop, samples):
+    """Record how late the event loop wakes up from a fixed sleep."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - start - LAG_PROBE_INTERVAL))
+
+
+def frame_jitter(frame_times):
+    """Standard deviation of the interval between frames, in milliseconds."""
+    intervals = [b - a for a, b in zip(frame_times, frame_times[1:])]
+    if len(intervals) < 2:
+        return 0.0
+    return statistics.pstdev(intervals) * 1000
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system, times.children_user + times.children_system
+
+
+async def run_round(guild_count, duration, tracks, trace_memory=False):
+    """Play tracks in guild_count guilds for duration seconds and return the measurements.
+
+    With trace_memory, peak_alloc_mb is measured too, at the cost of skewed CPU figures.
+    """
+    loop = asyncio.get_running_loop()
+    bot = SimpleNamespace(loop=loop, user=SimpleNamespace(id=0))
+    cog = MusicCog(bot)
+
+    async def resolve_local(track, guild_id=None):
+        return track.source
+
+    cog._resolve_stream = resolve_local
+    cog.lyrics_service.prefetch = lambda title: None
+    # The reconnect flags only apply to HTTP inputs and make FFmpeg reject local files
+    cog.FFMPEG_OPTIONS = {'before_options': '', 'options': '-vn'}
+
+    channels = []
+    for guild_id in range(1, guild_count + 1):
+        state = cog.get_guild_state(guild_id)
+        channel = FakeVoiceChannel(guild_id)
+        channels.append(channel)
+        for path in tracks:
+            state.music_queue.append(Track(path, os.path.basename(path), None, channel=channel))
+
+    lag_samples = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(stop, lag_samples))
+    if trace_memory:
+        tracemalloc.start()
+    cpu_before, children_before = cpu_seconds()
+    started = time.perf_counter()
+
+    await asyncio.gather(*(cog.play_music(None, guild_id) for guild_id in range(1, guild_count + 1)))
+    await asyncio.sleep(duration)
+
+    elapsed = time.perf_counter() - started
+    # Empty the queues first; a stopped track would otherwise start the next one
+    for state in list(cog.guild_states.values()):
+        await cog._reset_guild_state(state)
+    for channel in channels:
+        if channel.client is not None:
+            channel.client.stop()
+    stop.set()
+    await probe
+    # Give the player threads a moment to reap FFmpeg so its CPU time is counted
+    await asyncio.sleep(0.5)
+    cpu_after, children_after = cpu_seconds()
+    peak_memory = None
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    frames = [len(c.client.frame_times) for c in channels if c.client is not None]
+    jitters = [frame_jitter(c.client.frame_times) for c in channels if c.client is not None]
+    return {
+        'guilds': guild_count,
+        'cpu_per_guild': (cpu_after - cpu_before) / elapsed / guild_count * 100,
+        'ffmpeg_cpu_per_guild': (children_after - children_before) / elapsed / guild_count * 100,
+        'fps': statistics.mean(frames) / elapsed if frames else 0.0,
+        'jitter_ms': max(jitters) if jitters else 0.0,
+        'loop_lag_ms': max(lag_samples) * 1000 if lag_samples else 0.0,
+        'peak_alloc_mb': peak_memory / 2**20 if peak_memory is not None else None,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', default='1,5,10,25', help='comma-separated simulated guild counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to play per round')
+    parser.add_argument('--mode', choices=['opus', 'pcm'], default='opus', help='playback path to measure')
+    parser.add_argument('--memory', action='store_true', help='also trace Python allocations, in a separate pass')
+    args = parser.parse_args()
+
+    if shutil.which('ffmpeg') is None:
+        raise SystemExit("ffmpeg was not found on PATH.")
+    if not discord.opus.is_loaded():
+        try:
+            discord.opus._load_default()
+        except Exception:
+            pass
+    if not discord.opus.is_loaded():
+        print("warning: libopus is not loaded, the PCM path's Opus encoding is not measured")
+
+    music.OPUS_PASSTHROUGH = args.mode == 'opus'
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Tracks shorter than a round so play_next transitions are part of the measurement
+        track_seconds = max(2.0, args.duration / 3)
+        tracks = []
+        for i, frequency in enumerate((440.0, 523.25, 659.25, 783.99)):
+            path = os.path.join(tmp, f'tone{i}.wav')
+            generate_tone(path, track_seconds, frequency)
+            tracks.append(path)
+
+        print(f"mode={args.mode} duration={args.duration}s track={track_seconds:.1f}s")
+        print(f"{'guilds':>6} {'cpu%/g':>8} {'ffmpeg%/g':>10} {'fps':>7} {'jitter ms':>10} "
+              f"{'loop lag ms':>12} {'peak MB':>8} {'rss MB':>8}")
+        for guild_count in (int(n) for n in args.guilds.split(',')):
+            result = await run_round(guild_count, args.duration, tracks)
+            if args.memory:
+                traced = await run_round(guild_count, args.duration, tracks, trace_memory=True)
+                result['peak_alloc_mb'] = traced['peak_alloc_mb']
+            peak = f"{result['peak_alloc_mb']:>8.2f}" if result['peak_alloc_mb'] is not None else f"{'-':>8}"
+            print(f"{result['guilds']:>6} {result['cpu_per_guild']:>8.2f} {result['ffmpeg_cpu_per_guild']:>10.2f} "
+                  f"{result['fps']:>7.1f} {result['jitter_ms']:>10.2f} {result['loop_lag_ms']:>12.2f} "
+                  f"{peak} {result['max_rss_mb']:>8.1f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
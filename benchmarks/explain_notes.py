@@ -0,0 +1,66 @@
+"""Print the SQLite query plan of every statement in src/notes.py.
+
+The statements are found by parsing src/notes.py for execute() calls with a
+literal SQL string, so new queries are picked up automatically. By default
+they are explained against a fresh, fully migrated temporary database; pass
+--db to inspect an existing one (opened read-only).
+
+Usage (from the repository root):
+    python -m benchmarks.explain_notes
+    python -m benchmarks.explain_notes --db db/tasks.db
+"""
+import argparse
+import ast
+import os
+import sqlite3
+import tempfile
+
+import src.notes as notes
+from src.db import Database
+from src.migrations import migrate
+
+
+def notes_statements():
+    """Yield (line number, SQL) for each execute("...") call in src/notes.py."""
+    with open(notes.__file__) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                and node.func.attr == 'execute' and node.args
+                and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            yield node.lineno, ' '.join(node.args[0].value.split())
+
+
+def explain(conn, sql):
+    """Return the plan rows of sql as indented lines, binding NULL to every parameter."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", (None,) * sql.count('?')).fetchall()
+    depth = {0: 0}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append(f"{'  ' * depth[node_id]}{detail}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', help='existing database to explain against (default: a fresh migrated one)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.db:
+            conn = sqlite3.connect(f"file:{os.path.abspath(args.db)}?mode=ro", uri=True)
+        else:
+            database = Database(os.path.join(tmp, 'tasks.db'))
+            migrate(database)
+            conn = database.connection()
+        for lineno, sql in sorted(notes_statements()):
+            print(f"src/notes.py:{lineno}: {sql}")
+            for line in explain(conn, sql) or ["  (no table lookup)"]:
+                print(line)
+            print()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
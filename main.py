@@ -8,13 +8,18 @@ from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 
+# Before the src imports: several modules read their settings at import time
+load_dotenv()
+
 from src.dice import roll_dice
 from src.jokes import get_jokes
 from src.memes import register_memes
 from src.weather import get_weather
 from src.music import MusicCog
 from src.help_cog import HelpCog
-from src.notes import ensure_db_exists
+from src.http_client import HttpClient
+from src.db import db, async_db
+from src.migrations import migrate
 from src.notes import add_note
 from src.notes import get_note
 from src.notes import update_status
@@ -28,7 +33,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv()
 TOKEN = os.getenv('TOKEN')
 
 if not TOKEN:
@@ -56,9 +60,6 @@ def get_prefix(bot, message):
 bot = commands.Bot(command_prefix=get_prefix, intents=intents, help_command=None)
 _tree_synced = False
 
-# Initialize database at startup
-ensure_db_exists()
-
 @bot.event
 async def on_ready():
     global _tree_synced
@@ -103,7 +104,12 @@ remove_task(bot)
 edit_task(bot)
 
 async def main():
+    # Bring the database schema up to date once, before anything uses it
+    migrate()
     async with bot:
+        # Shared HTTP connection pool for jokes, weather and lyrics
+        bot.http_client = HttpClient()
+        await bot.http_client.start()
         await bot.add_cog(HelpCog(bot, guild_prefixes))  
         await bot.add_cog(MusicCog(bot))
 
@@ -115,15 +121,24 @@ async def main():
         await bot.start(TOKEN)
 
 async def shutdown(bot):
-    """Gracefully disconnect voice clients and close the bot."""
+    """Persist music queues, disconnect voice clients and close the bot."""
     logger.info("Shutting down...")
+    music = bot.get_cog("MusicCog")
+    if music is not None:
+        try:
+            await music.persist_queues()
+        except Exception as e:
+            logger.error(f"Failed to persist music queues: {e}")
     for vc in bot.voice_clients:
         try:
             await vc.disconnect(force=True)
         except Exception:
             pass
+    await bot.http_client.close()
     await bot.close()
+    await async_db.close()
+    db.close()
 
-asyncio.run(main())
-
-
+# Guarded so extraction workers started with spawn (where fork is unavailable) don't run the bot
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# The bot keeps all of its tables in one file
+SCRIPT_DIR = Path(__file__).parent.parent.absolute()
+DB_FOLDER = SCRIPT_DIR / 'db'
+DB_FILE = DB_FOLDER / 'tasks.db'
+
+# Connection tuning; see Database
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 8192
+MMAP_SIZE = 64 * 2**20
+# Prepared statements kept per connection, keyed by SQL text
+STATEMENT_CACHE_SIZE = 128
+# AsyncDatabase sizing: reader threads, and how many queued writes share one commit
+READ_THREADS = 4
+WRITE_BATCH_SIZE = 64
+
+
+class Database:
+    """Long-lived SQLite connections to one database file, one per thread.
+
+    Each thread opens its connection on first use and keeps it, so a query no longer
+    pays for connecting and re-preparing its statement. Connections run in WAL mode
+    with synchronous=NORMAL: readers never block the writer and a commit does not
+    fsync (checkpoints do), at the cost of possibly losing the last commits on power
+    loss but never corrupting the file. Use constant SQL strings so sqlite3's
+    per-connection statement cache is hit.
+    """
+    def __init__(self, path=DB_FILE):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Only the opening thread uses a connection; close() may run elsewhere
+        conn = sqlite3.connect(str(self.path), cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        with self._lock:
+            self._connections.append(conn)
+        logger.debug(f"Database: Opened connection to {self.path} in thread {threading.current_thread().name}")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Yield the thread's connection; commit when the block succeeds, roll back when it raises."""
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def fetchone(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def close(self):
+        """Close every thread's connection; threads reconnect if they use the database again."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        self._local = threading.local()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Database: Error closing connection -> {e}")
+
+
+class AsyncDatabase:
+    """Runs Database work off the event loop.
+
+    Reads go to a small thread pool, each thread with its own WAL connection. Writes
+    are queued to a single writer thread, which commits everything queued so far
+    (up to max_batch writes) in one transaction, so concurrent commands share a
+    commit. Every write runs inside its own savepoint, so a failing write is rolled
+    back and reported to its caller without affecting the rest of the batch.
+    Functions passed to read() and write() receive the connection as first argument.
+    """
+    def __init__(self, database, readers=READ_THREADS, max_batch=WRITE_BATCH_SIZE):
+        self.database = database
+        self.max_batch = max_batch
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='db-read')
+        self._writes = queue.SimpleQueue()
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def _ensure_writer(self):
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name='db-write', daemon=True)
+                self._writer.start()
+
+    async def read(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, lambda: fn(self.database.connection(), *args))
+
+    async def write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._ensure_writer()
+        self._writes.put((fn, args, loop, future))
+        return await future
+
+    def _write_loop(self):
+        conn = self.database.connection()
+        while True:
+            batch = [self._writes.get()]
+            while batch[-1] is not None and len(batch) < self.max_batch:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._commit_batch(conn, batch)
+            if stop:
+                return
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN")
+            for fn, args, loop, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    outcomes.append((loop, future, fn(conn, *args), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    outcomes.append((loop, future, None, e))
+            conn.commit()
+            if len(batch) > 1:
+                logger.debug(f"AsyncDatabase: Committed {len(batch)} writes in one transaction")
+        except sqlite3.Error as e:
+            logger.error(f"AsyncDatabase: Batch of {len(batch)} write(s) failed -> {e}")
+            if conn.in_transaction:
+                conn.rollback()
+            outcomes = [(loop, future, None, e) for _, _, loop, future in batch]
+        for loop, future, result, error in outcomes:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    async def close(self):
+        """Finish the queued writes, then stop the writer and reader threads."""
+        writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._writes.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, writer.join)
+        self._readers.shutdown(wait=False)
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+# Shared by notes, prefixes, music queues and the lyrics cache
+db = Database()
+async_db = AsyncDatabase(db)
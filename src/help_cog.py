@@ -1,37 +1,18 @@
-import sqlite3
 import discord
 from discord.ext import commands
-from pathlib import Path
 
-# Reuse the same DB path as notes
-SCRIPT_DIR = Path(__file__).parent.parent.absolute()
-DB_FOLDER = SCRIPT_DIR / 'db'
-DB_FILE = DB_FOLDER / 'tasks.db'
-
-
-def _ensure_prefix_table():
-    """Create the guild_prefixes table if it doesn't exist."""
-    if not DB_FOLDER.exists():
-        DB_FOLDER.mkdir(parents=True)
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        conn.execute('''CREATE TABLE IF NOT EXISTS guild_prefixes (
-                            guild_id INTEGER PRIMARY KEY,
-                            prefix TEXT NOT NULL
-                        )''')
+from src.db import db
 
 
 def _load_prefixes() -> dict:
     """Load all guild prefixes from the database."""
-    _ensure_prefix_table()
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        rows = conn.execute("SELECT guild_id, prefix FROM guild_prefixes").fetchall()
+    rows = db.fetchall("SELECT guild_id, prefix FROM guild_prefixes")
     return {row[0]: row[1] for row in rows}
 
 
 def _save_prefix(guild_id: int, prefix: str):
     """Save or update a guild's prefix in the database."""
-    _ensure_prefix_table()
-    with sqlite3.connect(str(DB_FILE)) as conn:
+    with db.transaction() as conn:
         conn.execute(
             "INSERT INTO guild_prefixes (guild_id, prefix) VALUES (?, ?) "
             "ON CONFLICT(guild_id) DO UPDATE SET prefix = excluded.prefix",
@@ -64,8 +45,11 @@ class HelpCog(commands.Cog):
 {prefix}pause - pauses the current song
 {prefix}resume - resumes the paused song
 {prefix}skip - skips the current song
+{prefix}volume <0-200> - sets the playback volume
 {prefix}stop - stops playing and clears the queue
 {prefix}queue - displays the current song queue
+{prefix}move <from> <to> - moves a song within the queue
+{prefix}shuffle - shuffles the queue
 {prefix}lyrics - shows lyrics for the current song
 
 **Bot Commands:**
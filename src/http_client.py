@@ -0,0 +1,88 @@
+import logging
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Connection pool sizing
+TOTAL_CONNECTIONS = 100
+CONNECTIONS_PER_HOST = 10
+DNS_CACHE_SECONDS = 300
+KEEPALIVE_SECONDS = 30
+DEFAULT_TIMEOUT = 10
+
+# Per-host overrides: maximum concurrent requests and total timeout in seconds
+HOST_LIMITS = {
+    'api.openweathermap.org': 5,
+    'v2.jokeapi.dev': 5,
+    'api.lyrics.ovh': 5,
+    'oauth.reddit.com': 5,
+}
+HOST_TIMEOUTS = {
+    'api.lyrics.ovh': 15,
+}
+
+
+class HttpClient:
+    """Bot-wide aiohttp session shared by every outbound HTTP call.
+
+    Connections are kept alive and pooled per host, DNS lookups are cached, and each
+    host gets its own concurrency limit and timeout. Create it with start() inside the
+    running event loop and release it with close().
+    """
+    def __init__(self, host_limits=None, host_timeouts=None):
+        self.host_limits = HOST_LIMITS if host_limits is None else host_limits
+        self.host_timeouts = HOST_TIMEOUTS if host_timeouts is None else host_timeouts
+        self._session = None
+        self._semaphores = {}
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=TOTAL_CONNECTIONS,
+                limit_per_host=CONNECTIONS_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+                keepalive_timeout=KEEPALIVE_SECONDS
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+            )
+            logger.info("HttpClient: Session started")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HttpClient: Session closed")
+        self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HttpClient is not started")
+        return self._session
+
+    def _semaphore(self, host):
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.host_limits.get(host, CONNECTIONS_PER_HOST))
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def request(self, method, url, **kwargs):
+        """Send a request within the host's concurrency limit and timeout; yields the response."""
+        host = urlparse(url).hostname
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=self.host_timeouts.get(host, DEFAULT_TIMEOUT))
+        async with self._semaphore(host):
+            async with self.session.request(method, url, **kwargs) as response:
+                yield response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
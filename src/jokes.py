@@ -1,33 +1,161 @@
+import os
+import json
 import asyncio
+import logging
 import aiohttp
 import discord
+from collections import deque
+from pathlib import Path
 from discord.ext import commands
 from discord import app_commands
 
+logger = logging.getLogger(__name__)
+
+JOKE_CATEGORIES = ["Programming", "Misc", "Dark", "Any"]
+# JokeAPI returns at most 10 jokes per request
+JOKE_BATCH_SIZE = 10
+# Refill a category in the background once it holds fewer jokes than this
+JOKE_LOW_WATER = 5
+JOKE_BUFFER_SIZE = 30
+# Joke IDs served recently are not put back into the pool
+RECENT_JOKES = 200
+# How long /joke waits for a refill when a category is completely empty
+JOKE_REFILL_WAIT = 8
+
+# Set JOKE_POOL_FILE to an empty string to keep the pool in memory only
+SCRIPT_DIR = Path(__file__).parent.parent.absolute()
+JOKE_POOL_FILE = os.getenv('JOKE_POOL_FILE', str(SCRIPT_DIR / 'db' / 'joke_pool.json'))
+
+
+def format_joke(data):
+    """Turn a JokeAPI joke object into the message text."""
+    if data['type'] == 'single':
+        return data['joke']
+    return f"{data['setup']} - **{data['delivery']}**"
+
+
+class JokePool:
+    """Per-category in-memory joke buffers refilled from JokeAPI's batch endpoint.
+
+    take() serves from memory and schedules a background refill when a category falls
+    below JOKE_LOW_WATER. Recently served jokes are skipped when refilling.
+    """
+    def __init__(self, bot, path=JOKE_POOL_FILE):
+        self.bot = bot
+        self.path = Path(path) if path else None
+        self._buffers = {category: deque() for category in JOKE_CATEGORIES}
+        self._refills = {}  # category -> asyncio.Task
+        self._recent = deque(maxlen=RECENT_JOKES)
+        self._recent_ids = set()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            saved = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"JokePool: Could not load {self.path}: {e}")
+            return
+        for category, jokes in saved.items():
+            if category in self._buffers:
+                self._buffers[category].extend((joke_id, text) for joke_id, text in jokes)
+        logger.info(f"JokePool: Loaded {sum(len(b) for b in self._buffers.values())} joke(s) from disk")
+
+    def _save(self):
+        snapshot = {category: list(buffer) for category, buffer in self._buffers.items()}
+
+        def write():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(snapshot))
+            tmp.replace(self.path)
+
+        return asyncio.get_running_loop().run_in_executor(None, write)
+
+    def _remember(self, joke_id):
+        if len(self._recent) == self._recent.maxlen:
+            self._recent_ids.discard(self._recent[0])
+        self._recent.append(joke_id)
+        self._recent_ids.add(joke_id)
+
+    def _schedule_refill(self, category):
+        task = self._refills.get(category)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refill(category))
+            self._refills[category] = task
+        return task
+
+    async def _refill(self, category):
+        buffer = self._buffers[category]
+        try:
+            async with self.bot.http_client.get(f'https://v2.jokeapi.dev/joke/{category}', params={'amount': JOKE_BATCH_SIZE}) as response:
+                response.raise_for_status()
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+            logger.warning(f"JokePool: Refill of {category} failed: {e!r}")
+            return
+        if data.get('error'):
+            logger.warning(f"JokePool: JokeAPI returned an error for {category}")
+            return
+        # A batch of one comes back as a bare joke rather than a list
+        jokes = data.get('jokes', [data])
+        queued = {joke_id for joke_id, _ in buffer}
+        added = 0
+        for joke in jokes:
+            joke_id = joke.get('id')
+            if joke_id in queued or joke_id in self._recent_ids or len(buffer) >= JOKE_BUFFER_SIZE:
+                continue
+            try:
+                buffer.append((joke_id, format_joke(joke)))
+            except KeyError:
+                continue
+            queued.add(joke_id)
+            added += 1
+        logger.debug(f"JokePool: Added {added} joke(s) to {category}, now {len(buffer)}")
+        if added and self.path is not None:
+            try:
+                await self._save()
+            except OSError as e:
+                logger.warning(f"JokePool: Could not save {self.path}: {e}")
+
+    def ready(self, category):
+        """True if take() can answer for category without waiting on the network."""
+        return bool(self._buffers[category])
+
+    async def take(self, category):
+        """Return a joke for category, or None if none could be fetched."""
+        buffer = self._buffers[category]
+        if not buffer:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._schedule_refill(category)), timeout=JOKE_REFILL_WAIT)
+            except asyncio.TimeoutError:
+                pass
+        if not buffer:
+            return None
+        joke_id, text = buffer.popleft()
+        self._remember(joke_id)
+        if len(buffer) < JOKE_LOW_WATER:
+            self._schedule_refill(category)
+        return text
+
 
 def get_jokes(bot: commands.Bot):
+    pool = JokePool(bot)
+
     @bot.tree.command(name="joke", description="Get a random joke (default: Any)")
     @app_commands.describe(category="Choose a joke category (optional)")
     @app_commands.choices(category=[
-        app_commands.Choice(name="Programming", value="Programming"),
-        app_commands.Choice(name="Misc", value="Misc"),
-        app_commands.Choice(name="Dark", value="Dark"),
-        app_commands.Choice(name="Any", value="Any")
+        app_commands.Choice(name=category, value=category) for category in JOKE_CATEGORIES
     ])
     async def joke(interaction: discord.Interaction, category: str = "Any"):
-        await interaction.response.defer()
-        try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(f'https://v2.jokeapi.dev/joke/{category}') as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    if data.get('error'):
-                        joke_message = "Failed to retrieve joke. Please try again later."
-                    elif data['type'] == 'single':
-                        joke_message = data['joke']
-                    else:
-                        joke_message = f"{data['setup']} - **{data['delivery']}**"
-        except (aiohttp.ClientError, aiohttp.ClientResponseError, KeyError, asyncio.TimeoutError):
+        if not pool.ready(category):
+            # Cold pool: the refill may take longer than the interaction deadline
+            await interaction.response.defer()
+        joke_message = await pool.take(category)
+        if joke_message is None:
             joke_message = "Failed to retrieve joke. Please try again later."
-
-        await interaction.followup.send(joke_message)
+        if interaction.response.is_done():
+            await interaction.followup.send(joke_message)
+        else:
+            await interaction.response.send_message(joke_message)
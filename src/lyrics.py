@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import aiohttp
+import discord
+
+from src.db import db
+
+logger = logging.getLogger(__name__)
+
+LYRICS_API_URL = 'https://api.lyrics.ovh/v1/{artist}/{title}'
+# Lookups kept in memory in front of the on-disk cache
+LYRICS_MEMORY_SIZE = 256
+# Songs the API has no lyrics for are asked about again after this long
+LYRICS_NEGATIVE_TTL = 24 * 3600
+# Characters per /lyrics page; an embed description holds at most 4096
+LYRICS_PAGE_CHARS = 3800
+
+# Words stripped from video titles before looking for "artist - song", in one pass.
+# Longer alternatives come first so "music video" wins over "video".
+TITLE_NOISE_RE = re.compile(
+    r'\b(?:music video|sped up|slowed|lyrics|official|audio|video|remix|cover|live|hd|hq)\b',
+    re.IGNORECASE
+)
+# Brackets left empty once the noise is gone, e.g. "(Official Video)" -> "()"
+EMPTY_BRACKETS_RE = re.compile(r'\(\s*\)|\[\s*\]|\{\s*\}')
+
+# Common YouTube title formats as (pattern, groups are (song, artist))
+TITLE_PATTERNS = [
+    (re.compile(r'^(.*?)\s*-\s*(.*?)$'), False),  # "Artist - Song"
+    (re.compile(r'^(.*?)\s*–\s*(.*?)$'), False),  # "Artist – Song" (different dash)
+    (re.compile(r'^(.*?)\s*:\s*(.*?)$'), False),  # "Artist : Song"
+    (re.compile(r'\"(.*?)\"\s*by\s*(.*?)$'), True),  # '"Song" by Artist'
+    (re.compile(r'^(.*?)\s*\"(.*?)\"$'), False),  # 'Artist "Song"'
+    (re.compile(r'^(.*?)\s*\((.*?)\)$'), False),  # "Artist (Song)"
+]
+
+
+def clean_title(title):
+    """Strip noise words and the empty brackets they leave behind from a video title."""
+    cleaned = EMPTY_BRACKETS_RE.sub('', TITLE_NOISE_RE.sub('', title))
+    return ' '.join(cleaned.split())
+
+
+def extract_artist_and_song(title):
+    """Return (artist, song) parsed from a video title, or (None, None)."""
+    cleaned = clean_title(title)
+    for pattern, swapped in TITLE_PATTERNS:
+        match = pattern.match(cleaned)
+        if match:
+            first, second = (group.strip() for group in match.groups())
+            if not first or not second:
+                continue
+            logger.debug(f"extract_artist_and_song: '{title}' matched {pattern.pattern}")
+            return (second, first) if swapped else (first, second)
+    logger.debug(f"extract_artist_and_song: No pattern matched '{cleaned}'")
+    return None, None
+
+
+def paginate_lyrics(lyrics, limit=LYRICS_PAGE_CHARS):
+    """Split lyrics into pages of at most limit characters, breaking between lines."""
+    pages = []
+    page = ''
+    for line in lyrics.strip().splitlines():
+        # A single overlong line is hard-wrapped
+        while len(line) > limit:
+            if page:
+                pages.append(page)
+                page = ''
+            pages.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{page}\n{line}" if page else line
+        if len(candidate) > limit:
+            pages.append(page)
+            page = line
+        else:
+            page = candidate
+    if page or not pages:
+        pages.append(page)
+    return pages
+
+
+def _read_lyrics(key):
+    """Return (lyrics or None, fetched_at) cached for (artist, title), or None."""
+    return db.fetchone("SELECT lyrics, fetched_at FROM lyrics_cache WHERE artist = ? AND title = ?", key)
+
+
+def _write_lyrics(key, lyrics, fetched_at):
+    with db.transaction() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO lyrics_cache (artist, title, lyrics, fetched_at) VALUES (?, ?, ?, ?)",
+            (*key, lyrics, fetched_at)
+        )
+
+
+class LyricsFetchError(Exception):
+    """The lyrics API could not be reached or answered with an error."""
+
+
+class LyricsService:
+    """Lyrics lookups by (artist, title) with a memory + SQLite cache.
+
+    "No lyrics" answers are cached too, for LYRICS_NEGATIVE_TTL. Concurrent lookups of
+    the same song share one request, so a prefetch started when a track begins playing
+    is simply joined by a later /lyrics. Transient API errors are never cached.
+    """
+    def __init__(self, bot, max_entries=LYRICS_MEMORY_SIZE):
+        self.bot = bot
+        self.max_entries = max_entries
+        self._memory = OrderedDict()  # (artist, title) casefolded -> (lyrics or None, fetched_at)
+        self._pending = {}  # (artist, title) casefolded -> asyncio.Task
+
+    @staticmethod
+    def _is_fresh(entry):
+        lyrics, fetched_at = entry
+        return lyrics is not None or time.time() - fetched_at < LYRICS_NEGATIVE_TTL
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, artist, title):
+        key = (artist.casefold(), title.casefold())
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, artist, title))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def _load(self, key, artist, title):
+        loop = asyncio.get_running_loop()
+        try:
+            entry = await loop.run_in_executor(None, _read_lyrics, key)
+        except sqlite3.Error as e:
+            logger.error(f"LyricsService: Could not read cached lyrics -> {e}")
+            entry = None
+        if entry is not None and self._is_fresh(entry):
+            self._remember(key, entry)
+            return entry[0]
+
+        lyrics = await self._request(artist, title)
+        entry = (lyrics, time.time())
+        self._remember(key, entry)
+        try:
+            await loop.run_in_executor(None, _write_lyrics, key, *entry)
+        except sqlite3.Error as e:
+            logger.error(f"LyricsService: Could not cache lyrics -> {e}")
+        return lyrics
+
+    async def _request(self, artist, title):
+        url = LYRICS_API_URL.format(artist=quote(artist, safe=''), title=quote(title, safe=''))
+        logger.debug(f"LyricsService: Requesting {url}")
+        try:
+            async with self.bot.http_client.get(url) as response:
+                if response.status == 404:
+                    return None
+                if response.status != 200:
+                    raise LyricsFetchError(f"HTTP {response.status}")
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise LyricsFetchError(str(e) or type(e).__name__) from e
+        return (data.get('lyrics') or '').strip() or None
+
+    async def get(self, artist, title):
+        """Return the lyrics or None if there are none; raises LyricsFetchError."""
+        entry = self._memory.get((artist.casefold(), title.casefold()))
+        if entry is not None and self._is_fresh(entry):
+            self._memory.move_to_end((artist.casefold(), title.casefold()))
+            return entry[0]
+        return await asyncio.shield(self._lookup(artist, title))
+
+    def prefetch(self, video_title):
+        """Start looking up the lyrics of a track in the background."""
+        artist, title = extract_artist_and_song(video_title)
+        if not artist or not title:
+            return
+        entry = self._memory.get((artist.casefold(), title.casefold()))
+        if entry is not None and self._is_fresh(entry):
+            return
+        task = self._lookup(artist, title)
+        task.add_done_callback(self._log_prefetch_failure)
+
+    @staticmethod
+    def _log_prefetch_failure(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"LyricsService: Prefetch failed -> {task.exception()}")
+
+
+class LyricsView(discord.ui.View):
+    """Previous/Next navigation through the pages of a long /lyrics answer."""
+    def __init__(self, heading, pages):
+        super().__init__(timeout=300)  # 5 minute timeout
+        self.heading = heading
+        self.pages = pages
+        self.page = 0
+        self.message = None
+
+    async def on_timeout(self):
+        """Disable all buttons when the view times out."""
+        for item in self.children:
+            item.disabled = True
+        try:
+            if self.message:
+                await self.message.edit(view=self)
+        except Exception:
+            pass
+
+    def footer(self):
+        return f"Page {self.page + 1}/{len(self.pages)}"
+
+    async def _show_page(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, len(self.pages) - 1))
+        embed = discord.Embed(description=f"{self.heading}{self.pages[self.page]}", color=discord.Color.green())
+        embed.set_footer(text=self.footer())
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show_page(interaction, self.page + 1)
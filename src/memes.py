@@ -1,11 +1,19 @@
 import os
+import json
+import time
 import random
+import asyncio
 import logging
 import praw
+import prawcore
+import aiohttp
 import discord
 from discord import app_commands
 from discord.ext import commands
-from collections import deque
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+from functools import partial
+from pathlib import Path
 
 from dotenv import load_dotenv
 
@@ -17,15 +25,33 @@ load_dotenv()
 REDDIT_CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
 REDDIT_CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
 USER_AGENT = os.getenv('USER_AGENT')
+# 'async' talks to Reddit over the bot's shared HTTP session; 'praw' uses PRAW in worker threads
+REDDIT_BACKEND = os.getenv('REDDIT_BACKEND', 'async').lower()
+REDDIT_USER_AGENT = f'MyDiscordBot/1.0 (by /u/{USER_AGENT or "unknown"})'
+
+REDDIT_TOKEN_URL = 'https://www.reddit.com/api/v1/access_token'
+REDDIT_API_URL = 'https://oauth.reddit.com'
+# Renew the OAuth token this many seconds before it expires
+REDDIT_TOKEN_MARGIN = 60
+# Keep this many requests of each rate-limit window in reserve
+REDDIT_RATELIMIT_RESERVE = 1
+# Requests per listing, counting retries after a 401 or 429
+REDDIT_ATTEMPTS = 3
+# A 429 asking to wait longer than this fails the /meme instead of retrying
+REDDIT_MAX_RETRY_WAIT = 15
 
 # Validate Reddit API credentials
 if not REDDIT_CLIENT_ID or not REDDIT_CLIENT_SECRET:
     logger.warning("Reddit API credentials not configured. /meme command will not work.")
     reddit = None
+elif REDDIT_BACKEND != 'praw':
+    if not USER_AGENT:
+        logger.warning("USER_AGENT not configured. Using default user agent.")
+    # The async backend needs no PRAW instance
+    reddit = None
 else:
     if not USER_AGENT:
         logger.warning("USER_AGENT not configured. Using default user agent.")
-    REDDIT_USER_AGENT = f'MyDiscordBot/1.0 (by /u/{USER_AGENT or "unknown"})'
 
     # Initialize Reddit with proper configuration for NSFW access
     reddit = praw.Reddit(
@@ -38,7 +64,192 @@ else:
     # Enable NSFW content access - read_only mode still allows accessing public NSFW content
     reddit.read_only = True
 
-sent_posts = deque(maxlen=1000)  # Use deque with max length for automatic cleanup
+# Top-of-month listings barely change: serve them fresh for 30 minutes, then serve the
+# cached copy while refreshing in the background for up to 6 hours
+LISTING_FRESH_SECONDS = 1800
+LISTING_STALE_SECONDS = 6 * 3600
+LISTING_CACHE_SIZE = 64
+
+# Recently sent posts are remembered per (guild, subreddit) scope
+SENT_HISTORY_SIZE = 500
+SENT_SCOPES = 4096
+SENT_SAVE_DELAY = 30
+# Set SENT_POSTS_FILE to an empty string to keep the history in memory only
+SCRIPT_DIR = Path(__file__).parent.parent.absolute()
+SENT_POSTS_FILE = os.getenv('SENT_POSTS_FILE', str(SCRIPT_DIR / 'db' / 'sent_posts.json'))
+
+# Validated image URL (or None) per post ID, shared by every subreddit listing
+IMAGE_CACHE_SIZE = 10000
+# Seconds allowed per image check, and posts tried per /meme before giving up
+IMAGE_CHECK_TIMEOUT = 3
+IMAGE_PICK_ATTEMPTS = 5
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+IMAGE_HOSTS = ('i.redd.it', 'i.imgur.com')
+
+# Everything /meme needs from a submission, extracted once when the listing is fetched.
+# image_candidates are possible image URLs, best first; ImageResolver picks image_url from them.
+PostRecord = namedtuple('PostRecord', 'id title score url image_url nsfw author subreddit image_candidates')
+
+class RedditRateLimiter:
+    """Process-wide view of Reddit's X-Ratelimit-* headers.
+
+    Every request reserves one call from the current window; once the window is spent,
+    callers sleep until Reddit says it resets instead of getting 429s.
+    """
+    def __init__(self, reserve=REDDIT_RATELIMIT_RESERVE):
+        self.reserve = reserve
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if self.remaining is None or now >= self.reset_at or self.remaining > self.reserve:
+                if self.remaining is not None:
+                    self.remaining -= 1
+                return
+            delay = self.reset_at - now
+            logger.warning(f"RedditRateLimiter: Window exhausted, waiting {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def update(self, headers):
+        try:
+            remaining = float(headers['X-Ratelimit-Remaining'])
+            reset = float(headers['X-Ratelimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        self.remaining = remaining
+        self.reset_at = time.monotonic() + reset
+
+    def backoff(self, headers):
+        """Block every caller after a 429; returns the wait in seconds.
+
+        Reddit says how long in Retry-After or X-Ratelimit-Reset; without either,
+        wait a whole (10 minute) window.
+        """
+        delay = 600.0
+        for name in ('Retry-After', 'X-Ratelimit-Reset'):
+            try:
+                delay = float(headers[name])
+                break
+            except (KeyError, ValueError):
+                continue
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.monotonic() + delay)
+        return delay
+
+
+class RedditError(Exception):
+    """A subreddit listing could not be fetched."""
+
+
+class SubredditNotFound(RedditError):
+    """The subreddit does not exist or is banned."""
+
+
+class SubredditForbidden(RedditError):
+    """The subreddit is private, quarantined or otherwise restricted."""
+
+
+class RedditUnavailable(RedditError):
+    """Reddit could not be reached, failed, or is rate limiting us."""
+
+
+class RedditClient(ABC):
+    """Interface of the /meme Reddit backends."""
+    @abstractmethod
+    async def fetch_top_posts(self, subreddit_name):
+        """Return this month's top posts of a subreddit as PostRecords.
+
+        Returns [] when Reddit is not configured; raises SubredditNotFound,
+        SubredditForbidden or RedditUnavailable.
+        """
+
+
+class AsyncRedditClient(RedditClient):
+    """Reddit API client running on the event loop through the bot's shared HttpClient.
+
+    Uses application-only OAuth (no user account), renews the token shortly before it
+    expires and shares one RedditRateLimiter across all concurrent /meme calls.
+    """
+    def __init__(self, bot, client_id=REDDIT_CLIENT_ID, client_secret=REDDIT_CLIENT_SECRET, user_agent=REDDIT_USER_AGENT):
+        self.bot = bot
+        self.auth = aiohttp.BasicAuth(client_id, client_secret) if client_id and client_secret else None
+        self.headers = {'User-Agent': user_agent}
+        self.rate_limiter = RedditRateLimiter()
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = asyncio.Lock()
+
+    async def _get_token(self):
+        async with self._token_lock:
+            if self._token is None or time.monotonic() >= self._token_expires:
+                async with self.bot.http_client.request(
+                    'POST', REDDIT_TOKEN_URL, auth=self.auth, headers=self.headers,
+                    data={'grant_type': 'client_credentials'}
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                self._token = data['access_token']
+                self._token_expires = time.monotonic() + data.get('expires_in', 3600) - REDDIT_TOKEN_MARGIN
+                logger.info("AsyncRedditClient: Obtained access token")
+            return self._token
+
+    async def _get_json(self, path, params):
+        status = None
+        for attempt in range(REDDIT_ATTEMPTS):
+            token = await self._get_token()
+            await self.rate_limiter.acquire()
+            headers = {**self.headers, 'Authorization': f'bearer {token}'}
+            # Unknown subreddits redirect to the search page; treat that as not found
+            async with self.bot.http_client.get(
+                f'{REDDIT_API_URL}{path}', params=params, headers=headers, allow_redirects=False
+            ) as response:
+                status = response.status
+                self.rate_limiter.update(response.headers)
+                if status == 200:
+                    return await response.json()
+                if status == 401 and attempt == 0:
+                    self._token = None
+                    continue
+                if status == 429:
+                    delay = self.rate_limiter.backoff(response.headers)
+                    logger.warning(f"AsyncRedditClient: Rate limited on {path}, backing off {delay:.1f}s")
+                    if delay <= REDDIT_MAX_RETRY_WAIT:
+                        continue
+                    raise RedditUnavailable(f"Rate limited for {delay:.0f}s")
+            logger.warning(f"AsyncRedditClient: {path} returned HTTP {status}")
+            if status == 404 or 300 <= status < 400:
+                raise SubredditNotFound(path)
+            if status == 403:
+                raise SubredditForbidden(path)
+            raise RedditUnavailable(f"HTTP {status}")
+        raise RedditUnavailable(f"HTTP {status}")
+
+    async def fetch_top_posts(self, subreddit_name):
+        if self.auth is None:
+            logger.warning("Reddit API not configured")
+            return []
+        try:
+            data = await self._get_json(
+                f'/r/{subreddit_name}/top', {'t': 'month', 'limit': 100, 'raw_json': 1}
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            logger.error(f"Error fetching posts from r/{subreddit_name}: {e}")
+            raise RedditUnavailable(str(e) or type(e).__name__) from e
+        children = data.get('data', {}).get('children', [])
+        return [post_record_from_json(child['data']) for child in children
+                if child.get('kind') == 't3' and not child['data'].get('stickied')]
+
+
+class PrawRedditClient(RedditClient):
+    """Fallback backend: synchronous PRAW in the default executor."""
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def fetch_top_posts(self, subreddit_name):
+        return await self.bot.loop.run_in_executor(None, fetch_top_posts, subreddit_name)
+
 
 def fetch_top_posts(subreddit_name):
     if reddit is None:
@@ -47,54 +258,310 @@ def fetch_top_posts(subreddit_name):
     try:
         subreddit = reddit.subreddit(subreddit_name)
         top_posts = list(subreddit.top(time_filter='month', limit=100))
-        top_posts = [post for post in top_posts if not post.stickied]
-        return top_posts
+        return [to_post_record(post) for post in top_posts if not post.stickied]
+    except (prawcore.exceptions.Redirect, prawcore.exceptions.NotFound) as e:
+        raise SubredditNotFound(subreddit_name) from e
+    except prawcore.exceptions.Forbidden as e:
+        raise SubredditForbidden(subreddit_name) from e
     except Exception as e:
         logger.error(f"Error fetching posts from r/{subreddit_name}: {e}")
-        return []
+        raise RedditUnavailable(str(e) or type(e).__name__) from e
+
+class SentPostTracker:
+    """Recently sent post IDs per (guild, subreddit) scope.
+
+    Each scope is a bounded insertion-ordered set (an OrderedDict), giving O(1)
+    membership and O(1) eviction of the oldest ID, so one busy guild cannot push out
+    another guild's history. Scopes themselves are evicted least recently used.
+    The history is optionally saved to disk a short while after it changes.
+    """
+    def __init__(self, path=SENT_POSTS_FILE, per_scope=SENT_HISTORY_SIZE, max_scopes=SENT_SCOPES):
+        self.path = Path(path) if path else None
+        self.per_scope = per_scope
+        self.max_scopes = max_scopes
+        self._scopes = OrderedDict()  # (guild_id, subreddit) -> OrderedDict(post_id -> None)
+        self._save_task = None
+        self._load()
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            saved = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"SentPostTracker: Could not load {self.path}: {e}")
+            return
+        for guild_id, subreddit, post_ids in saved:
+            self._scopes[(guild_id, subreddit)] = OrderedDict.fromkeys(post_ids[-self.per_scope:])
+
+    def _schedule_save(self):
+        if self.path is None or (self._save_task is not None and not self._save_task.done()):
+            return
+        self._save_task = asyncio.ensure_future(self._save_later())
+
+    async def _save_later(self):
+        await asyncio.sleep(SENT_SAVE_DELAY)
+        snapshot = [[guild_id, subreddit, list(ids)] for (guild_id, subreddit), ids in self._scopes.items()]
 
-def get_unique_random_post_info(posts):
-    unsent_posts = [post for post in posts if post.id not in sent_posts]
-    if not unsent_posts:
+        def write():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.tmp')
+            tmp.write_text(json.dumps(snapshot))
+            tmp.replace(self.path)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, write)
+        except OSError as e:
+            logger.warning(f"SentPostTracker: Could not save {self.path}: {e}")
+
+    def recent(self, guild_id, subreddit):
+        """Return the scope's sent IDs (supports O(1) `in`); empty if nothing was sent yet."""
+        return self._scopes.get((guild_id, subreddit.lower()), {})
+
+    def add(self, guild_id, subreddit, post_id):
+        key = (guild_id, subreddit.lower())
+        ids = self._scopes.get(key)
+        if ids is None:
+            ids = self._scopes[key] = OrderedDict()
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        else:
+            self._scopes.move_to_end(key)
+        ids[post_id] = None
+        ids.move_to_end(post_id)
+        while len(ids) > self.per_scope:
+            ids.popitem(last=False)
+        self._schedule_save()
+
+
+class ListingCache:
+    """Per-subreddit cache of top-of-month listings with stale-while-revalidate refresh.
+
+    At most max_entries subreddits are kept, evicting the least recently used. Empty
+    listings and errors are never cached; a failed background refresh keeps serving
+    the stale copy. A fetched listing is served right away; if validate is given it
+    then runs in the background and its result replaces the stored listing.
+    """
+    def __init__(self, fetch, validate=None, fresh=LISTING_FRESH_SECONDS, stale=LISTING_STALE_SECONDS,
+                 max_entries=LISTING_CACHE_SIZE):
+        self._fetch = fetch  # coroutine (subreddit_name) -> list of posts
+        self._validate = validate  # coroutine (posts) -> the posts worth keeping
+        self.fresh = fresh
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # subreddit (lowercase) -> (fetched_at, posts)
+        self._refreshing = {}  # subreddit (lowercase) -> asyncio.Task
+        self._validating = {}  # subreddit (lowercase) -> asyncio.Task
+
+    def _refresh(self, key, subreddit_name):
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, subreddit_name))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+            task.add_done_callback(self._log_refresh_failure)
+        return task
+
+    @staticmethod
+    def _log_refresh_failure(task):
+        # Also marks the error as retrieved when only a background refresh saw it
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"ListingCache: Refresh failed -> {task.exception()!r}")
+
+    async def _fetch_and_store(self, key, subreddit_name):
+        posts = await self._fetch(subreddit_name)
+        if posts:
+            self._store(key, time.monotonic(), posts)
+            if self._validate is not None:
+                self._validate_later(key, posts)
+        return posts
+
+    def _store(self, key, fetched_at, posts):
+        self._entries[key] = (fetched_at, posts)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _validate_later(self, key, posts):
+        previous = self._validating.get(key)
+        if previous is not None:
+            previous.cancel()
+        task = asyncio.ensure_future(self._validate(posts))
+        self._validating[key] = task
+        task.add_done_callback(partial(self._validated, key, posts))
+
+    def _validated(self, key, posts, task):
+        if self._validating.get(key) is task:
+            del self._validating[key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning(f"ListingCache: Validating {key} failed -> {task.exception()!r}")
+            return
+        entry = self._entries.get(key)
+        # Only replace the listing it was started for, not a newer refresh or an eviction
+        if entry is not None and entry[1] is posts:
+            self._entries[key] = (entry[0], task.result())
+
+    async def get(self, subreddit_name):
+        key = subreddit_name.lower()
+        entry = self._entries.get(key)
+        if entry is not None:
+            fetched_at, posts = entry
+            age = time.monotonic() - fetched_at
+            self._entries.move_to_end(key)
+            if age < self.fresh:
+                return posts
+            if age < self.stale:
+                logger.debug(f"ListingCache: Serving stale r/{subreddit_name}, refreshing in background")
+                self._refresh(key, subreddit_name)
+                return posts
+        return await asyncio.shield(self._refresh(key, subreddit_name))
+
+
+def _unescape(url):
+    return url.replace('&amp;', '&')
+
+
+def image_candidates(post):
+    """Possible image URLs of a submission's raw data, best first."""
+    candidates = []
+    url = post.get('url') or ''
+    path = url.split('?', 1)[0].lower()
+    # Direct image links
+    if path.endswith(IMAGE_EXTENSIONS) or any(f'//{host}/' in url for host in IMAGE_HOSTS):
+        candidates.append(url)
+    # Galleries: the first item in gallery order that Reddit finished processing
+    if post.get('is_gallery'):
+        metadata = post.get('media_metadata') or {}
+        for item in (post.get('gallery_data') or {}).get('items', []):
+            media = metadata.get(item.get('media_id'), {})
+            source = media.get('s', {}) if media.get('status') == 'valid' else {}
+            if source.get('u') or source.get('gif'):
+                candidates.append(_unescape(source.get('u') or source.get('gif')))
+                break
+    # Preview images also cover v.redd.it videos and link posts
+    for image in (post.get('preview') or {}).get('images', [])[:1]:
+        if image.get('source', {}).get('url'):
+            candidates.append(_unescape(image['source']['url']))
+    # Last resort, e.g. v.redd.it posts without a preview
+    thumbnail = post.get('thumbnail') or ''
+    if thumbnail.startswith('http'):
+        candidates.append(_unescape(thumbnail))
+    return tuple(dict.fromkeys(candidates))
+
+
+class ImageResolver:
+    """Picks a working image URL for each post of a listing.
+
+    A post's candidates are HEAD-requested in order with a short timeout, stopping at
+    the first usable one, and the outcome is cached per post ID so listing refreshes
+    only check new posts. resolve() checks a whole listing concurrently, in the
+    background right after it is fetched; pick() only checks a post itself when
+    /meme chooses one that resolve() has not got to yet. If a check fails on a network
+    error the candidate is used unverified and not cached, so a flaky image host does
+    not empty /meme.
+    """
+    def __init__(self, bot, max_entries=IMAGE_CACHE_SIZE, timeout=IMAGE_CHECK_TIMEOUT):
+        self.bot = bot
+        self.max_entries = max_entries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._resolved = OrderedDict()  # post ID -> image URL or None
+
+    async def _check(self, url):
+        """True/False if the URL is/isn't a usable image, None if that couldn't be determined."""
+        try:
+            async with self.bot.http_client.head(url, allow_redirects=True, timeout=self.timeout) as response:
+                if response.status == 405:
+                    return True
+                content_type = response.headers.get('Content-Type', '')
+                return response.status < 400 and (not content_type or content_type.startswith('image/'))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"ImageResolver: Could not check {url}: {e}")
+            return None
+
+    def _store(self, post_id, image_url):
+        self._resolved[post_id] = image_url
+        self._resolved.move_to_end(post_id)
+        while len(self._resolved) > self.max_entries:
+            self._resolved.popitem(last=False)
+
+    async def image_url(self, post):
+        """Return a usable image URL of post, or None if it has none."""
+        if post.id in self._resolved:
+            self._resolved.move_to_end(post.id)
+            return self._resolved[post.id]
+        for url in post.image_candidates:
+            usable = await self._check(url)
+            if usable is None:
+                return url
+            if usable:
+                self._store(post.id, url)
+                return url
+        self._store(post.id, None)
+        return None
+
+    async def resolve(self, posts):
+        """Return the posts that have an image, with image_url set; all are checked concurrently."""
+        urls = await asyncio.gather(*(self.image_url(post) for post in posts))
+        resolved = [post._replace(image_url=url, image_candidates=()) for post, url in zip(posts, urls) if url]
+        logger.debug(f"ImageResolver: {len(resolved)}/{len(posts)} posts have an image")
+        return resolved
+
+    async def pick(self, posts, sent_ids, attempts=IMAGE_PICK_ATTEMPTS):
+        """Return a random unsent post with image_url set, or None.
+
+        Posts resolve() already handled need no request. Others are checked here, at
+        most attempts of them, so a listing still being validated cannot stall /meme.
+        """
+        # Skips posts already known to have no image; unchecked ones count by their candidates
+        unsent = [post for post in posts
+                  if post.id not in sent_ids and self._resolved.get(post.id, post.image_candidates)]
+        random.shuffle(unsent)
+        checked = 0
+        for post in unsent:
+            if post.image_url:
+                return post
+            if checked == attempts:
+                break
+            checked += 1
+            image_url = await self.image_url(post)
+            # A concurrent /meme may have sent it while we were checking
+            if image_url and post.id not in sent_ids:
+                return post._replace(image_url=image_url, image_candidates=())
         return None
-    random_post = random.choice(unsent_posts)
-    
-    # Determine image URL - handle various Reddit image formats
-    image_url = None
-    try:
-        # Direct image links
-        if random_post.url.endswith(('jpg', 'jpeg', 'png', 'gif')):
-            image_url = random_post.url
-        # i.redd.it images
-        elif 'i.redd.it' in random_post.url:
-            image_url = random_post.url
-        # Preview images (for NSFW and other content)
-        elif hasattr(random_post, 'preview'):
-            if 'images' in random_post.preview and len(random_post.preview['images']) > 0:
-                # Get the highest quality preview image
-                source = random_post.preview['images'][0]['source']
-                image_url = source['url'].replace('&amp;', '&')
-        # v.redd.it or other Reddit-hosted content
-        elif hasattr(random_post, 'media') and random_post.media:
-            if 'reddit_video' in random_post.media:
-                # For videos, use the thumbnail
-                if hasattr(random_post, 'thumbnail') and random_post.thumbnail.startswith('http'):
-                    image_url = random_post.thumbnail
-    except Exception as e:
-        logger.error(f"Error extracting image URL: {e}")
-    
-    post_info = {
-        "id": random_post.id,
-        "title": random_post.title,
-        "score": random_post.score,
-        "url": random_post.url,
-        "subreddit": random_post.subreddit.display_name,
-        "author": str(random_post.author) if random_post.author else "[deleted]",
-        "created_utc": random_post.created_utc,
-        "image_url": image_url,
-        "nsfw": random_post.over_18
-    }
-    return post_info
+
+
+def to_post_record(post):
+    """Copy the fields /meme uses out of a PRAW submission so it can be dropped."""
+    return PostRecord(
+        id=post.id,
+        title=post.title,
+        score=post.score,
+        url=post.url,
+        image_url=None,
+        nsfw=post.over_18,
+        author=str(post.author) if post.author else "[deleted]",
+        subreddit=post.subreddit.display_name,
+        # PRAW keeps the submission's raw JSON fields as instance attributes
+        image_candidates=image_candidates(vars(post))
+    )
+
+
+def post_record_from_json(data):
+    """Build a PostRecord from a submission in a raw Reddit listing."""
+    return PostRecord(
+        id=data['id'],
+        title=data['title'],
+        score=data['score'],
+        url=data['url'],
+        image_url=None,
+        nsfw=data.get('over_18', False),
+        author=data.get('author') or "[deleted]",
+        subreddit=data['subreddit'],
+        image_candidates=image_candidates(data)
+    )
+
 
 # Popular subreddits for autocomplete suggestions
 POPULAR_SUBREDDITS = [
@@ -105,6 +572,16 @@ POPULAR_SUBREDDITS = [
 ]
 
 def register_memes(bot: commands.Bot):
+    sent_posts = SentPostTracker()
+    reddit_client = PrawRedditClient(bot) if REDDIT_BACKEND == 'praw' else AsyncRedditClient(bot)
+    image_resolver = ImageResolver(bot)
+
+    async def fetch_listing(subreddit_name):
+        # Posts with no image candidate at all can never be sent; ListingCache validates the rest
+        return [post for post in await reddit_client.fetch_top_posts(subreddit_name) if post.image_candidates]
+
+    listing_cache = ListingCache(fetch_listing, validate=image_resolver.resolve)
+
     async def subreddit_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
         """Autocomplete function to suggest popular subreddits"""
         current_lower = current.lower().replace('r/', '')
@@ -124,45 +601,47 @@ def register_memes(bot: commands.Bot):
             # Defer the response to prevent timeout for slow requests
             await interaction.response.defer()
             
-            posts = await bot.loop.run_in_executor(None, fetch_top_posts, subreddit)
+            posts = await listing_cache.get(subreddit)
             
             if not posts:
-                await interaction.followup.send(f"Could not find any posts in r/{subreddit}. Please check the subreddit name and try again.")
+                await interaction.followup.send(f"Could not find any image posts in r/{subreddit}. Please check the subreddit name and try again.")
                 return
                 
-            post_info = get_unique_random_post_info(posts)
+            # DMs have no guild; their channel ID is just as unique a scope
+            scope = interaction.guild_id or interaction.channel_id
+            post_info = await image_resolver.pick(posts, sent_posts.recent(scope, subreddit))
 
             if post_info is None:
                 await interaction.followup.send("No new posts available at the moment. Please try again later.")
                 return
 
             # Track post immediately to prevent duplicates from concurrent requests
-            sent_posts.append(post_info['id'])
+            sent_posts.add(scope, subreddit, post_info.id)
 
             # Set embed color based on NSFW status
-            embed_color = discord.Color.red() if post_info.get('nsfw', False) else discord.Color.blue()
-            embed = discord.Embed(title=post_info['title'], url=post_info['url'], color=embed_color)
+            embed_color = discord.Color.red() if post_info.nsfw else discord.Color.blue()
+            embed = discord.Embed(title=post_info.title, url=post_info.url, color=embed_color)
             
             # Add NSFW warning if applicable
-            if post_info.get('nsfw', False):
+            if post_info.nsfw:
                 embed.add_field(name="⚠️ NSFW", value="This post is marked as NSFW", inline=False)
             
-            embed.add_field(name="Score", value=f"⬆️ {post_info['score']}", inline=True)
-            embed.add_field(name="Subreddit", value=f"r/{post_info['subreddit']}", inline=True)
-            embed.add_field(name="Author", value=f"u/{post_info['author']}", inline=True)
+            embed.add_field(name="Score", value=f"⬆️ {post_info.score}", inline=True)
+            embed.add_field(name="Subreddit", value=f"r/{post_info.subreddit}", inline=True)
+            embed.add_field(name="Author", value=f"u/{post_info.author}", inline=True)
 
-            if post_info['image_url']:
-                embed.set_image(url=post_info['image_url'])
+            embed.set_image(url=post_info.image_url)
 
             # Mark the message as NSFW if the post is NSFW
             await interaction.followup.send(embed=embed)
 
+        except SubredditNotFound:
+            await interaction.followup.send(f"❌ Subreddit r/{subreddit} not found. Please check the spelling and try again.", ephemeral=True)
+        except SubredditForbidden:
+            await interaction.followup.send(f"❌ r/{subreddit} is private or restricted. Try a different subreddit.", ephemeral=True)
+        except RedditUnavailable as e:
+            logger.warning(f"Reddit unavailable for r/{subreddit}: {e}")
+            await interaction.followup.send("❌ Reddit is not responding right now. Please try again in a moment.", ephemeral=True)
         except Exception as e:
-            error_message = str(e).lower()
-            if 'redirect' in error_message or 'not found' in error_message or '404' in error_message:
-                await interaction.followup.send(f"❌ Subreddit r/{subreddit} not found. Please check the spelling and try again.", ephemeral=True)
-            elif 'private' in error_message or 'forbidden' in error_message:
-                await interaction.followup.send(f"❌ r/{subreddit} is private or restricted. Try a different subreddit.", ephemeral=True)
-            else:
-                logger.error(f"Error fetching from r/{subreddit}: {e}")
-                await interaction.followup.send(f"❌ An error occurred while fetching from r/{subreddit}. Please try again.", ephemeral=True)
+            logger.error(f"Error fetching from r/{subreddit}: {e}")
+            await interaction.followup.send(f"❌ An error occurred while fetching from r/{subreddit}. Please try again.", ephemeral=True)
@@ -0,0 +1,100 @@
+import logging
+
+from src.db import db
+
+logger = logging.getLogger(__name__)
+
+
+def _create_notes_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS tasks (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task TEXT NOT NULL,
+                        user_id INTEGER NOT NULL,
+                        date TEXT NOT NULL,
+                        status TEXT DEFAULT 'to-do',
+                        guild_id INTEGER DEFAULT 0
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY,
+                        username TEXT NOT NULL
+                    )''')
+    # Databases from before per-guild notes have a tasks table without guild_id
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()]
+    if 'guild_id' not in columns:
+        conn.execute("ALTER TABLE tasks ADD COLUMN guild_id INTEGER DEFAULT 0")
+
+
+def _create_prefix_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS guild_prefixes (
+                        guild_id INTEGER PRIMARY KEY,
+                        prefix TEXT NOT NULL
+                    )''')
+
+
+def _create_queue_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS music_queues (
+                        guild_id INTEGER PRIMARY KEY,
+                        tracks TEXT NOT NULL,
+                        position REAL DEFAULT 0,
+                        updated_at REAL NOT NULL
+                    )''')
+
+
+def _create_lyrics_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS lyrics_cache (
+                        artist TEXT NOT NULL,
+                        title TEXT NOT NULL,
+                        lyrics TEXT,
+                        fetched_at REAL NOT NULL,
+                        PRIMARY KEY (artist, title)
+                    )''')
+
+
+def _index_tasks(conn):
+    # /list, /update, /remove and /edit all look tasks up by user, date and guild.
+    # status and task make the index covering, so those reads never touch the table
+    # (id is the rowid, which every index carries). Statements by id use the rowid.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_date_guild "
+                 "ON tasks (user_id, date, guild_id, status, task)")
+
+
+# Applied in order; a database at version N has run the first N migrations.
+# Append new migrations, never edit or reorder released ones. Databases created
+# before versioning already have some of these tables, hence IF NOT EXISTS.
+MIGRATIONS = [
+    ("notes tables", _create_notes_tables),
+    ("guild prefixes", _create_prefix_table),
+    ("music queues", _create_queue_table),
+    ("lyrics cache", _create_lyrics_table),
+    ("tasks lookup index", _index_tasks),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(database=db):
+    """Bring the database up to SCHEMA_VERSION; a no-op when it already is.
+
+    The version is kept in PRAGMA user_version. Each migration commits together with
+    its version bump, so an interrupted run resumes where it stopped. BEGIN IMMEDIATE
+    keeps two processes from migrating at the same time.
+    """
+    conn = database.connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this bot ({SCHEMA_VERSION})")
+    for number, (name, apply) in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+                conn.rollback()
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"migrate: Applied migration {number} ({name})")
+    return SCHEMA_VERSION
@@ -1,98 +1,950 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from youtubesearchpython import VideosSearch
 from yt_dlp import YoutubeDL
-import aiohttp
 import asyncio
+import multiprocessing
+import os
+import random
 import re
+import tempfile
+import time
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from collections import OrderedDict, deque
+from itertools import islice
+from urllib.parse import urlparse, parse_qs
+
+from src.lyrics import LyricsFetchError, LyricsService, LyricsView, extract_artist_and_song, paginate_lyrics
+from src.music_store import QueueStore
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Number of upcoming queue entries whose stream URL is resolved ahead of time
+PREFETCH_DEPTH = 2
+# Treat stream URLs as stale this many seconds before they actually expire
+STREAM_URL_EXPIRY_MARGIN = 300
+# Fallback lifetime when the stream URL carries no expire parameter
+DEFAULT_STREAM_URL_TTL = 3600
+# Number of tracks shown per /queue page
+QUEUE_PAGE_SIZE = 10
+# Titles are cut to this length so a full page always fits in one embed
+QUEUE_TITLE_LIMIT = 100
+# Send Opus straight from FFmpeg when no volume change is needed; set to 0 to always use PCM
+OPUS_PASSTHROUGH = os.getenv('MUSIC_OPUS_PASSTHROUGH', '1') != '0'
+# Voice connections idle (nothing playing) or alone in the channel longer than this are closed
+IDLE_DISCONNECT_SECONDS = float(os.getenv('MUSIC_IDLE_TIMEOUT', '300'))
+# Guild states with no voice connection and no queue are dropped after this long without use
+STATE_EVICT_SECONDS = float(os.getenv('MUSIC_STATE_TTL', '1800'))
+LIFECYCLE_SWEEP_SECONDS = 60
+# How often queued changes are written to disk, and how often playing guilds save their position
+QUEUE_FLUSH_SECONDS = 2
+QUEUE_POSITION_SAVE_SECONDS = 15
+# How many times a track refused mid-stream (HTTP 403) is re-resolved and resumed
+MAX_STREAM_RESUMES = 2
+# Bulk /play limits; see MusicCog._enqueue_bulk
+MAX_PLAYLIST_ITEMS = 100
+MAX_BULK_QUERIES = 25
+BULK_RESOLVE_CONCURRENCY = 2
+BULK_PROGRESS_INTERVAL = 1.5  # seconds between progress message edits
+# Maximum number of yt-dlp extraction results kept in the shared cache
+EXTRACTION_CACHE_SIZE = 512
+
+# yt-dlp worker pool sizing; see ExtractionPool
+EXTRACT_WORKERS = int(os.getenv('MUSIC_EXTRACT_WORKERS', '2'))
+EXTRACT_MAX_PENDING = int(os.getenv('MUSIC_EXTRACT_MAX_PENDING', '32'))
+EXTRACT_MAX_PER_GUILD = int(os.getenv('MUSIC_EXTRACT_MAX_PER_GUILD', '2'))
+EXTRACT_TIMEOUT = float(os.getenv('MUSIC_EXTRACT_TIMEOUT', '30'))
+
+# /play autocomplete tuning; see AutocompleteEngine
+AUTOCOMPLETE_DEBOUNCE = 0.3
+AUTOCOMPLETE_BUDGET = 2.5  # Discord drops autocomplete responses after 3 seconds
+AUTOCOMPLETE_CACHE_TTL = 600
+AUTOCOMPLETE_CACHE_SIZE = 1024
+AUTOCOMPLETE_LOCAL_MIN_RESULTS = 3
+
+# noplaylist: a watch URL that also names a playlist or mix (&list=...) plays just that video
+YDL_OPTIONS = {'format': 'bestaudio/best', 'quiet': True, 'noplaylist': True}
+
+# Matches the 11-character video ID in the common YouTube URL shapes
+YOUTUBE_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})')
+
+
+def get_video_id(url):
+    """Return the canonical YouTube video ID for a URL, or the URL itself if none is found."""
+    match = YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else url
+
+
+def get_stream_url_expiry(url):
+    """Return the unix time at which a resolved stream URL stops being valid."""
+    try:
+        expire = parse_qs(urlparse(url).query).get('expire')
+        if expire:
+            return float(expire[0])
+    except (ValueError, TypeError):
+        pass
+    return time.time() + DEFAULT_STREAM_URL_TTL
+
+
+def parse_duration(duration):
+    """Convert a 'h:mm:ss' / 'm:ss' duration string to seconds (0 for live or unknown)."""
+    if not duration:
+        return 0
+    seconds = 0
+    try:
+        for part in str(duration).split(':'):
+            seconds = seconds * 60 + int(part)
+    except ValueError:
+        return 0
+    return seconds
+
+
+def format_duration(seconds):
+    """Convert seconds to a 'h:mm:ss' or 'm:ss' string."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def has_fresh_stream_url(track):
+    """Check whether a queued track already carries a usable resolved stream URL."""
+    if not track.stream_url:
+        return False
+    return track.stream_expires - STREAM_URL_EXPIRY_MARGIN > time.time()
+
+
+# yt-dlp instance owned by each extraction worker process
+_worker_ytdl = None
+
+
+def extract_stream_info(url):
+    """Run yt-dlp for url and keep only the fields needed for playback.
+
+    Runs inside an ExtractionPool worker, so the result must be picklable.
+    """
+    global _worker_ytdl
+    if _worker_ytdl is None:
+        _worker_ytdl = YoutubeDL(YDL_OPTIONS)
+    data = _worker_ytdl.extract_info(url, download=False)
+    return {
+        'url': data['url'],
+        'expires': get_stream_url_expiry(data['url']),
+        'title': data.get('title'),
+        'duration': data.get('duration'),
+        'thumbnail': data.get('thumbnail'),
+        'acodec': data.get('acodec'),
+    }
+
+
+def extract_playlist_entries(url, limit=MAX_PLAYLIST_ITEMS):
+    """Flat-extract a playlist into search_yt-style song dicts without resolving streams.
+
+    Runs inside an ExtractionPool worker, so the result must be picklable.
+    """
+    ytdl = YoutubeDL({**YDL_OPTIONS, 'extract_flat': 'in_playlist', 'playlistend': limit})
+    data = ytdl.extract_info(url, download=False)
+    songs = []
+    for entry in data.get('entries') or []:
+        if not entry or not entry.get('id'):
+            continue
+        thumbnails = entry.get('thumbnails')
+        songs.append({
+            'source': f"https://www.youtube.com/watch?v={entry['id']}",
+            'title': entry.get('title') or 'Unknown title',
+            'duration': format_duration(entry['duration']) if entry.get('duration') else 'Unknown',
+            'thumbnail': thumbnails[-1].get('url') if thumbnails else None
+        })
+    return songs[:limit]
+
+
+def is_playlist_url(query):
+    """True if query is a YouTube playlist page (/playlist?list=...).
+
+    Watch and youtu.be URLs stay a single track even with a list= parameter: that is
+    how YouTube links a video inside a playlist or an endless RD/UL mix.
+    """
+    parsed = urlparse(query.strip())
+    return (parsed.scheme in ('http', 'https') and parsed.path.rstrip('/') == '/playlist'
+            and bool(parse_qs(parsed.query).get('list')))
+
+
+def split_queries(query):
+    """Split a /play argument into its comma-separated queries."""
+    return [part.strip() for part in query.split(',') if part.strip()]
+
+
+def search_yt(item):
+    logger.debug(f"search_yt: Searching YouTube for '{item}'")
+    try:
+        search = VideosSearch(item, limit=1)
+        results = search.result()["result"]
+        if not results:
+            logger.warning("search_yt: No results found")
+            return None
+        result = results[0]
+        logger.debug(f"search_yt: Found video -> Title: {result['title']}, Link: {result['link']}")
+        thumbnails = result.get("thumbnails")
+        thumbnail_url = None
+        if thumbnails and len(thumbnails) > 0:
+            thumbnail_url = thumbnails[0].get("url")
+        return {
+            'source': result["link"],
+            'title': result["title"],
+            'duration': result["duration"],
+            'thumbnail': thumbnail_url
+        }
+    except Exception as e:
+        logger.error(f"search_yt: Failed to find or parse results. Error: {e}")
+        return None
+
+
+def search_yt_videos(query, limit=5):
+    """Return the raw VideosSearch results for query."""
+    search = VideosSearch(query, limit=limit)
+    return search.result()["result"]
+
+
+def _warm_up_worker():
+    return os.getpid()
+
+
+def _pool_context():
+    """The start method for extraction workers; see ExtractionPool.start."""
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' in methods:
+        context = multiprocessing.get_context('forkserver')
+        # The fork server imports yt-dlp once and every worker inherits it
+        context.set_forkserver_preload([__name__])
+        return context
+    if 'fork' in methods:
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+class ExtractionPoolBusy(Exception):
+    """Raised when the extraction pool already has too many pending jobs."""
+
+
+class ExtractionPool:
+    """Bounded process pool for yt-dlp extraction and YouTube searches.
+
+    Jobs beyond max_pending are rejected with ExtractionPoolBusy, each guild may only
+    run max_per_guild jobs at once (the rest wait their turn), and a job is handed to
+    the executor only once a worker is free, so its timeout counts running time, not
+    time spent queued. A timed-out job keeps its worker, and the worker stays counted
+    as busy until the job really ends; only when every worker is stuck like that are
+    the workers killed and replaced. A crashed worker breaks the whole executor, so
+    it is replaced too and the jobs it cut off are retried once.
+    """
+    def __init__(self, max_workers=EXTRACT_WORKERS, max_pending=EXTRACT_MAX_PENDING,
+                 max_per_guild=EXTRACT_MAX_PER_GUILD, timeout=EXTRACT_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_per_guild = max_per_guild
+        self.timeout = timeout
+        self.pending = 0
+        self._guild_slots = {}  # guild_id -> [asyncio.Semaphore, users]
+        self._free_workers = asyncio.Semaphore(max_workers)
+        self._overdue = 0  # timed-out jobs still running on the current executor
+        self._executor = None
+        self.recycled = 0
+
+    def start(self):
+        """Create the executor.
+
+        Workers come from a fork server where the platform has one. warm_up starts it
+        before the gateway and voice threads exist, and every worker, replacements
+        included, is forked from that single-threaded process. Elsewhere workers are
+        forked from the bot itself or, without fork, spawned. Non-fork workers import
+        main.py as __mp_main__, which is why it only runs the bot under __main__.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=_pool_context()
+            )
+            self._overdue = 0
+            logger.info(f"ExtractionPool: Started with {self.max_workers} worker(s)")
+
+    async def warm_up(self):
+        """Start the workers now, before the gateway and voice threads exist."""
+        self.start()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, _warm_up_worker)
+
+    def _recycle(self, executor, reason):
+        """Kill executor's workers and let the next job start fresh ones.
+
+        Jobs still running on them fail with BrokenProcessPool and are retried.
+        """
+        if self._executor is not executor:
+            return  # another job already replaced it
+        logger.warning(f"ExtractionPool: Replacing workers, {reason}")
+        self._executor = None
+        self.recycled += 1
+        # ProcessPoolExecutor offers no public way to stop a job that is already running
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    def _overdue_done(self, executor, _future):
+        if executor is self._executor:
+            self._overdue -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def is_saturated(self):
+        """True when new jobs will have to wait for a free worker."""
+        return self.pending >= self.max_workers
+
+    def _job_done(self, future):
+        self._free_workers.release()
+        # Nobody awaits a job after its timeout; don't let its outcome be logged as unretrieved
+        if not future.cancelled():
+            future.exception()
+
+    async def _run_once(self, fn, args):
+        await self._free_workers.acquire()
+        self.start()
+        executor = self._executor
+        try:
+            # submit() raises BrokenProcessPool right away once the executor is broken
+            future = asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            self._free_workers.release()
+            self._recycle(executor, "a worker process died")
+            raise
+        except Exception:
+            self._free_workers.release()
+            raise
+        # The worker is only free again once the job ends, even if we stop waiting for it
+        future.add_done_callback(self._job_done)
+        try:
+            # Shielded so a timeout or a cancelled caller doesn't mark the job done early
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._overdue += 1
+                future.add_done_callback(partial(self._overdue_done, executor))
+                if self._overdue >= self.max_workers:
+                    self._recycle(executor, f"all {self.max_workers} stuck on timed-out jobs")
+            raise
+        except BrokenProcessPool:
+            self._recycle(executor, "a worker process died")
+            raise
+
+    async def run(self, fn, *args, guild_id=None):
+        """Run fn(*args) in a worker process and return its result."""
+        if self.pending >= self.max_pending:
+            raise ExtractionPoolBusy(f"{self.pending} extraction jobs already pending")
+        self.pending += 1
+        slot = self._guild_slots.setdefault(guild_id, [asyncio.Semaphore(self.max_per_guild), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                try:
+                    return await self._run_once(fn, args)
+                except BrokenProcessPool:
+                    logger.info(f"ExtractionPool: Retrying {fn.__name__} on new workers")
+                    return await self._run_once(fn, args)
+        finally:
+            self.pending -= 1
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._guild_slots.pop(guild_id, None)
+
+
+class ExtractionCache:
+    """LRU cache of yt-dlp extraction results shared by every guild.
+
+    Entries are keyed by video ID and expire together with their signed stream URL.
+    Concurrent lookups of the same video share a single in-flight extraction.
+    """
+    def __init__(self, max_entries=EXTRACTION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # video_id -> info dict
+        self._in_flight = {}  # video_id -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return a cached, unexpired entry and mark it as recently used."""
+        info = self._entries.get(key)
+        if info is None:
+            return None
+        if info['expires'] - STREAM_URL_EXPIRY_MARGIN <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return info
+
+    def put(self, key, info):
+        self._entries[key] = info
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    async def get_or_extract(self, url, extract):
+        """Return extraction info for url, calling the extract coroutine only on a miss."""
+        key = get_video_id(url)
+        info = self.get(key)
+        if info is not None:
+            self.hits += 1
+            return info
+        self.misses += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._extract_and_store(key, url, extract))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield so a cancelled waiter (e.g. a prefetch) does not abort the shared extraction
+        return await asyncio.shield(task)
+
+    async def _extract_and_store(self, key, url, extract):
+        info = await extract(url)
+        self.put(key, info)
+        return info
+
+
+class AutocompleteEngine:
+    """Debounced, cached YouTube search behind the /play autocomplete.
+
+    A new keystroke cancels the same user's pending search, results are cached per
+    normalized query, and a cached shorter prefix is filtered locally when it already
+    yields enough matches. Answers are always returned within AUTOCOMPLETE_BUDGET.
+    """
+    def __init__(self, search, debounce=AUTOCOMPLETE_DEBOUNCE, budget=AUTOCOMPLETE_BUDGET,
+                 ttl=AUTOCOMPLETE_CACHE_TTL, max_entries=AUTOCOMPLETE_CACHE_SIZE):
+        self._search = search  # coroutine (query, guild_id) -> VideosSearch results
+        self.debounce = debounce
+        self.budget = budget
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()  # normalized query -> (expires, [(title, duration, link)])
+        self._pending = {}  # user_id -> asyncio.Task
+
+    @staticmethod
+    def normalize(query):
+        return ' '.join(query.lower().split())
+
+    def _get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key, results):
+        self._cache[key] = (time.time() + self.ttl, results)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _filter_prefix(self, key):
+        """Filter the results of the longest cached prefix of key by its words."""
+        words = key.split()
+        for end in range(len(key) - 1, 0, -1):
+            results = self._get(key[:end])
+            if results is not None:
+                return [r for r in results if all(w in r[0].lower() for w in words)]
+        return []
+
+    async def _debounced_search(self, key, guild_id):
+        await asyncio.sleep(self.debounce)
+        videos = await self._search(key, guild_id)
+        results = [(video['title'], video['duration'], video['link']) for video in videos]
+        self._put(key, results)
+        return results
+
+    async def suggest(self, user_id, query, guild_id=None):
+        """Return up to five (title, duration, link) suggestions for query."""
+        key = self.normalize(query)
+        if not key:
+            return []
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        local = self._filter_prefix(key)
+        if len(local) >= AUTOCOMPLETE_LOCAL_MIN_RESULTS:
+            return local
+
+        previous = self._pending.get(user_id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+        task = asyncio.ensure_future(self._debounced_search(key, guild_id))
+        self._pending[user_id] = task
+        task.add_done_callback(lambda t: self._pending.pop(user_id, None) if self._pending.get(user_id) is t else None)
+
+        try:
+            # Shield so a search that overruns the budget still lands in the cache
+            return await asyncio.wait_for(asyncio.shield(task), timeout=self.budget)
+        except asyncio.TimeoutError:
+            logger.debug(f"AutocompleteEngine: Budget exceeded for '{key}', serving local results")
+            return local
+        except asyncio.CancelledError:
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                # Superseded by a newer keystroke from the same user
+                return local
+            raise
+        except Exception as e:
+            logger.error(f"AutocompleteEngine: Search failed for '{key}' -> {e}")
+            return local
+
+
+class FFmpegErrorLog:
+    """Temporary file that receives FFmpeg's stderr so a refused stream (HTTP 403) can be detected.
+
+    A real file descriptor is handed to FFmpeg: given a plain Python object, discord.py
+    starts a stderr reader thread that busy-loops from the moment FFmpeg exits until
+    the buffered audio has finished playing.
+    """
+    TAIL_BYTES = 65536
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def stream_refused(self):
+        """True if FFmpeg reported an HTTP 403 for the stream URL."""
+        try:
+            self._file.seek(0, os.SEEK_END)
+            self._file.seek(max(0, self._file.tell() - self.TAIL_BYTES))
+            text = self._file.read()
+        except (OSError, ValueError):
+            return False
+        return b'403' in text and b'Forbidden' in text
+
+    def close(self):
+        self._file.close()
+
+
+class PlaybackTracking:
+    """Mixin for audio sources that remember their track and how far playback got."""
+    FRAME_SECONDS = discord.opus.Encoder.FRAME_LENGTH / 1000
+
+    def _init_tracking(self, track, error_log, start_offset, attempt):
+        self.track = track
+        self.error_log = error_log
+        self.start_offset = start_offset
+        self.attempt = attempt
+        self.frames = 0
+        # Set when the source is stopped on purpose to be replaced (e.g. volume change)
+        self.replaced = False
+
+    def read(self):
+        data = super().read()
+        if data:
+            self.frames += 1
+        return data
+
+    @property
+    def position(self):
+        """Seconds into the track that have been sent to Discord."""
+        return self.start_offset + self.frames * self.FRAME_SECONDS
+
+
+class TrackedPCMSource(PlaybackTracking, discord.PCMVolumeTransformer):
+    """Decodes to PCM so the volume can be changed; costs a Python-side Opus encode per frame."""
+    def __init__(self, original, track, error_log, start_offset=0.0, attempt=0, volume=1.0):
+        super().__init__(original, volume=volume)
+        self._init_tracking(track, error_log, start_offset, attempt)
+
+
+class TrackedOpusSource(PlaybackTracking, discord.FFmpegOpusAudio):
+    """Lets FFmpeg produce Opus packets that are sent as-is, skipping PCM and the Python encoder.
+
+    With codec='copy' an Opus stream (YouTube's WebM audio) is not re-encoded at all.
+    """
+    def __init__(self, stream_url, track, error_log, start_offset=0.0, attempt=0, **ffmpeg_kwargs):
+        super().__init__(stream_url, stderr=error_log, **ffmpeg_kwargs)
+        self._init_tracking(track, error_log, start_offset, attempt)
+
+
+class Track:
+    """A queued song together with the voice channel it was requested from."""
+    __slots__ = ('source', 'title', 'duration', 'seconds', 'thumbnail', 'channel',
+                 'stream_url', 'stream_expires', 'stream_codec', 'resume_at')
+
+    def __init__(self, source, title, duration, thumbnail=None, channel=None):
+        self.source = source
+        self.title = title
+        self.duration = duration
+        self.seconds = parse_duration(duration)
+        self.thumbnail = thumbnail
+        self.channel = channel
+        self.stream_url = None
+        self.stream_expires = 0
+        self.stream_codec = None
+        self.resume_at = 0.0  # seconds to seek to on the next playback, e.g. after a restart
+
+    @classmethod
+    def from_search(cls, song, channel):
+        """Build a Track from a search_yt result dict."""
+        return cls(song['source'], song['title'], song['duration'], song.get('thumbnail'), channel)
+
+    def to_dict(self):
+        """Serializable form used by QueueStore."""
+        return {
+            'source': self.source,
+            'title': self.title,
+            'duration': self.duration,
+            'thumbnail': self.thumbnail,
+            'channel_id': self.channel.id if self.channel is not None else None,
+        }
+
 
-def extract_artist_and_song(title):
-    logger.debug(f"extract_artist_and_song: Original Title: {title}")
-    
-    # Define regex patterns for common YouTube title formats
-    patterns = [
-        r'^(.*?)\s*-\s*(.*?)$',  # "Artist - Song"
-        r'^(.*?)\s*–\s*(.*?)$',  # "Artist – Song" (different dash)
-        r'^(.*?)\s*:\s*(.*?)$',  # "Artist : Song"
-        r'\"(.*?)\"\s*by\s*(.*?)$',  # '"Song" by Artist' -> swap: artist=group2, song=group1
-        r'^(.*?)\s*\"(.*?)\"$',  # 'Artist "Song"'
-        r'^(.*?)\s*\((.*?)\)$',  # "Artist (Song)"
-    ]
-    
-    # Words to ignore in the title
-    ignore_words = [
-        "slowed", "sped up", "lyrics", "official", "audio", "video", "music video",
-        "remix", "cover", "live", "HD", "HQ"
-    ]
-    
-    # Remove ignore words from the title
-    clean_title = title
-    for word in ignore_words:
-        clean_title = re.sub(rf'\b{word}\b', '', clean_title, flags=re.IGNORECASE)
-    
-    clean_title = ' '.join(clean_title.split())  # Trim extra spaces
-    logger.debug(f"extract_artist_and_song: Cleaned Title: {clean_title}")
-
-    # Try each pattern
-    for pattern in patterns:
-        match = re.match(pattern, clean_title)
-        if match:
-            first, second = match.groups()
-            # Handle special case: '"Song" by Artist' pattern returns (song, artist)
-            # Need to swap them - detect by checking if 'by' is in the pattern
-            if 'by' in pattern:
-                logger.debug(f"extract_artist_and_song: 'by' pattern matched, swapping: artist={second.strip()}, song={first.strip()}")
-                return second.strip(), first.strip()
-            logger.debug(f"extract_artist_and_song: Matched pattern '{pattern}', artist={first.strip()}, song={second.strip()}")
-            return first.strip(), second.strip()
-
-    logger.debug("extract_artist_and_song: No pattern matched, returning None, None")
-    return None, None
+class TrackQueue:
+    """Deque-backed song queue with O(1) dequeue and cached rendered pages.
+
+    total_seconds is kept up to date on every change so /queue never has to sum it.
+    on_change, if given, is called after every modification.
+    """
+    def __init__(self, on_change=None):
+        self._tracks = deque()
+        self._pages = {}  # page index -> rendered text, cleared on every change
+        self.total_seconds = 0
+        self._on_change = on_change
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __iter__(self):
+        return iter(self._tracks)
+
+    def __getitem__(self, index):
+        return self._tracks[index]
+
+    def _changed(self):
+        self._pages.clear()
+        if self._on_change is not None:
+            self._on_change()
+
+    def append(self, track):
+        self._tracks.append(track)
+        self.total_seconds += track.seconds
+        self._changed()
+
+    def popleft(self):
+        """Remove and return the next track, or None if the queue is empty."""
+        if not self._tracks:
+            return None
+        track = self._tracks.popleft()
+        self.total_seconds -= track.seconds
+        self._changed()
+        return track
+
+    def peek(self, count):
+        """Return the next count tracks without removing them."""
+        return list(islice(self._tracks, count))
+
+    def remove(self, index):
+        """Remove and return the track at a zero-based index."""
+        track = self._tracks[index]
+        del self._tracks[index]
+        self.total_seconds -= track.seconds
+        self._changed()
+        return track
+
+    def move(self, src, dst):
+        """Move the track at zero-based index src to index dst."""
+        track = self._tracks[src]
+        del self._tracks[src]
+        self._tracks.insert(dst, track)
+        self._changed()
+        return track
+
+    def shuffle(self):
+        tracks = list(self._tracks)
+        random.shuffle(tracks)
+        self._tracks = deque(tracks)
+        self._changed()
+
+    def clear(self):
+        self._tracks.clear()
+        self.total_seconds = 0
+        self._changed()
+
+    def page_count(self, per_page=QUEUE_PAGE_SIZE):
+        return max(1, -(-len(self._tracks) // per_page))
+
+    def render_page(self, page, per_page=QUEUE_PAGE_SIZE):
+        """Return the text listing for a zero-based page, rendering it only once per change."""
+        text = self._pages.get(page)
+        if text is None:
+            start = page * per_page
+            text = "\n".join(
+                f"#{start + i + 1} - {track.title[:QUEUE_TITLE_LIMIT]} ({track.duration})"
+                for i, track in enumerate(islice(self._tracks, start, start + per_page))
+            )
+            self._pages[page] = text
+        return text
 
 
 class GuildMusicState:
     """Per-guild music state to handle multiple servers properly."""
-    def __init__(self):
+    def __init__(self, on_change=None):
         self.is_playing = False
         self.is_paused = False
-        self.music_queue = []
+        self.music_queue = TrackQueue(on_change)
         self.current_song = None
         self.vc = None
+        self.prefetch_task = None
+        self.source = None  # audio source currently handed to the voice client
+        self.volume = 1.0
+        self.last_active = time.monotonic()
+        self.idle_since = None  # when the voice connection was last seen idle or alone
+
+    def cancel_prefetch(self):
+        """Cancel any in-flight look-ahead resolution for this guild."""
+        if self.prefetch_task is not None and not self.prefetch_task.done():
+            self.prefetch_task.cancel()
+        self.prefetch_task = None
 
 
 class MusicCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.guild_states = {}  # Dictionary to store per-guild state
-        self.YDL_OPTIONS = {'format': 'bestaudio/best'}
         self.FFMPEG_OPTIONS = {
             'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
             'options': '-vn'
         }
-        self.ytdl = YoutubeDL(self.YDL_OPTIONS)
+        self.extraction_pool = ExtractionPool()
+        self.extraction_cache = ExtractionCache()
+        self.autocomplete = AutocompleteEngine(self._search_videos)
+        self.evicted_states = 0
+        self.idle_disconnects = 0
+        self.queue_store = QueueStore()
+        self._startup_cleaned = False
+        self._resume_tasks = set()  # background resumes of restored queues
+        self.lyrics_service = LyricsService(bot)
         logger.info("MusicCog initialized")
 
+    async def cog_load(self):
+        await self.extraction_pool.warm_up()
+        self.lifecycle_sweep.start()
+        self.flush_queues.start()
+
+    async def cog_unload(self):
+        self.lifecycle_sweep.cancel()
+        self.flush_queues.cancel()
+        self.extraction_pool.shutdown()
+
+    async def cog_before_invoke(self, ctx):
+        if ctx.guild is not None:
+            await self._restore_queue(ctx.guild.id)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.guild_id is not None:
+            await self._restore_queue(interaction.guild_id)
+        return True
+
+    async def _restore_queue(self, guild_id: int):
+        """Reload a guild's persisted queue on its first music command after startup.
+
+        Runs before the command itself, so playback is only started in the background
+        and the command can still answer (or defer) within Discord's deadline.
+        """
+        if not self.queue_store.needs_restore(guild_id):
+            return
+        saved = await self.queue_store.restore(asyncio.get_running_loop(), guild_id)
+        if not saved:
+            return
+        state = self.get_guild_state(guild_id)
+        if state.is_playing or len(state.music_queue) > 0:
+            return
+        tracks, position = saved
+        restored = 0
+        for data in tracks:
+            channel = self.bot.get_channel(data['channel_id']) if data.get('channel_id') else None
+            if channel is None:
+                continue
+            track = Track(data['source'], data['title'], data['duration'], data.get('thumbnail'), channel)
+            if restored == 0:
+                # The first saved track was playing when the bot stopped; pick up where it left off
+                track.resume_at = position
+            state.music_queue.append(track)
+            restored += 1
+        logger.info(f"_restore_queue: Restored {restored} track(s) for guild {guild_id}")
+        if restored:
+            task = asyncio.ensure_future(self._resume_restored(guild_id))
+            self._resume_tasks.add(task)
+            task.add_done_callback(self._resume_tasks.discard)
+
+    async def _resume_restored(self, guild_id: int):
+        """Start a restored queue if someone is in its voice channel; otherwise it waits for /play."""
+        state = self.get_guild_state(guild_id)
+        upcoming = state.music_queue.peek(1)
+        # The command that triggered the restore may already have started or cleared it
+        if not upcoming:
+            return
+        channel = upcoming[0].channel
+        if state.is_playing or not any(not member.bot for member in getattr(channel, 'members', [])):
+            return
+        logger.info(f"_resume_restored: Resuming restored queue in guild {guild_id}")
+        try:
+            await self.play_music(None, guild_id)
+        except Exception as e:
+            logger.error(f"_resume_restored: Could not resume guild {guild_id} -> {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Drop the saved queues of guilds the bot left while it was offline.
+
+        The others stay on disk until their guild's next music command restores them.
+        """
+        if self._startup_cleaned:
+            return
+        self._startup_cleaned = True
+        loop = asyncio.get_running_loop()
+        for guild_id in await self.queue_store.saved_guilds(loop):
+            if self.bot.get_guild(guild_id) is None:
+                await self.queue_store.delete(loop, guild_id)
+
+    def _queue_snapshot(self, guild_id: int):
+        """Return ([current track + queue as dicts], position in the current track) for QueueStore."""
+        state = self.guild_states.get(guild_id)
+        if state is None:
+            return [], 0.0
+        tracks = []
+        position = 0.0
+        if state.current_song is not None:
+            tracks.append(state.current_song.to_dict())
+            if state.source is not None and state.source.track is state.current_song:
+                position = state.source.position
+        tracks.extend(track.to_dict() for track in state.music_queue)
+        return tracks, position
+
+    @tasks.loop(seconds=QUEUE_FLUSH_SECONDS)
+    async def flush_queues(self):
+        """Write queued changes to disk in one batch, refreshing playing guilds' positions now and then."""
+        if self.flush_queues.current_loop % (QUEUE_POSITION_SAVE_SECONDS // QUEUE_FLUSH_SECONDS) == 0:
+            for guild_id, state in self.guild_states.items():
+                if state.is_playing:
+                    self.queue_store.mark_dirty(guild_id)
+        await self.queue_store.flush(asyncio.get_running_loop(), self._queue_snapshot)
+
+    async def persist_queues(self):
+        """Flush every queue before shutdown; later changes (like the disconnect itself) are not saved."""
+        self.flush_queues.cancel()
+        await self.queue_store.close(asyncio.get_running_loop(), self._queue_snapshot)
+
     def get_guild_state(self, guild_id: int) -> GuildMusicState:
         """Get or create the music state for a guild."""
         if guild_id not in self.guild_states:
-            self.guild_states[guild_id] = GuildMusicState()
-        return self.guild_states[guild_id]
+            self.guild_states[guild_id] = GuildMusicState(partial(self.queue_store.mark_dirty, guild_id))
+        state = self.guild_states[guild_id]
+        state.last_active = time.monotonic()
+        return state
+
+    def lifecycle_stats(self):
+        """Counts of live guild states and of what the lifecycle sweep has reclaimed."""
+        return {
+            'live_states': len(self.guild_states),
+            'connected': sum(1 for state in self.guild_states.values() if state.vc is not None and state.vc.is_connected()),
+            'evicted_states': self.evicted_states,
+            'idle_disconnects': self.idle_disconnects,
+        }
+
+    @tasks.loop(seconds=LIFECYCLE_SWEEP_SECONDS)
+    async def lifecycle_sweep(self):
+        """Disconnect idle or lonely voice clients and drop dormant guild states."""
+        now = time.monotonic()
+        # Iterate over a copy: disconnecting can trigger on_voice_state_update
+        for guild_id, state in list(self.guild_states.items()):
+            vc = state.vc
+            if vc is not None and vc.is_connected():
+                listeners = [m for m in vc.channel.members if not m.bot]
+                # A paused player with listeners is waiting for them, not idle
+                if (vc.is_playing() or vc.is_paused()) and listeners:
+                    state.idle_since = None
+                elif state.idle_since is None:
+                    state.idle_since = now
+                elif now - state.idle_since >= IDLE_DISCONNECT_SECONDS:
+                    logger.info(f"lifecycle_sweep: Disconnecting idle voice client in guild {guild_id}")
+                    await self._park_guild(guild_id, state)
+                    self.idle_disconnects += 1
+                continue
+            if (not state.is_playing and len(state.music_queue) == 0
+                    and now - state.last_active >= STATE_EVICT_SECONDS):
+                state.cancel_prefetch()
+                del self.guild_states[guild_id]
+                self.evicted_states += 1
+
+        logger.debug(f"lifecycle_sweep: {self.lifecycle_stats()}")
+
+    @lifecycle_sweep.before_loop
+    async def before_lifecycle_sweep(self):
+        await self.bot.wait_until_ready()
+
+    async def _park_guild(self, guild_id: int, state):
+        """Leave voice and drop the guild's state, keeping its saved queue for the next music command."""
+        self.queue_store.mark_dirty(guild_id)
+        await self.queue_store.flush(asyncio.get_running_loop(), self._queue_snapshot)
+        vc = state.vc
+        # Otherwise the disconnect's after-callback advances the (now empty) queue and saves that
+        if state.source is not None:
+            state.source.replaced = True
+        # Nothing below suspends until forget(), so the reset's queue clear never reaches the store
+        self.guild_states.pop(guild_id, None)
+        await self._reset_guild_state(state)
+        self.queue_store.forget(guild_id)
+        if vc is not None:
+            try:
+                await vc.disconnect()
+            except Exception as e:
+                logger.warning(f"_park_guild: Error while disconnecting -> {e}")
+
+    async def _reset_guild_state(self, state, disconnect=False):
+        """Stop playback, clear the queue and optionally leave the voice channel."""
+        vc = state.vc
+        state.is_playing = False
+        state.is_paused = False
+        state.music_queue.clear()
+        state.current_song = None
+        state.vc = None
+        state.source = None
+        state.idle_since = None
+        state.cancel_prefetch()
+        if disconnect and vc is not None:
+            try:
+                await vc.disconnect()
+            except Exception as e:
+                logger.warning(f"_reset_guild_state: Error while disconnecting -> {e}")
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         """Clean up guild state when bot leaves a server."""
         if guild.id in self.guild_states:
             state = self.guild_states[guild.id]
+            state.cancel_prefetch()
             if state.vc and state.vc.is_connected():
                 await state.vc.disconnect()
             del self.guild_states[guild.id]
             logger.info(f"Cleaned up music state for guild {guild.id}")
+        await self.queue_store.delete(asyncio.get_running_loop(), guild.id)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
@@ -103,92 +955,181 @@ class MusicCog(commands.Cog):
         if before.channel is not None and after.channel is None:
             guild_id = before.channel.guild.id
             if guild_id in self.guild_states:
-                state = self.guild_states[guild_id]
-                state.is_playing = False
-                state.is_paused = False
-                state.music_queue.clear()
-                state.current_song = None
-                state.vc = None
+                await self._reset_guild_state(self.guild_states[guild_id])
                 logger.info(f"Bot was disconnected from voice in guild {guild_id}, state reset.")
 
-    async def send_embed(self, ctx_or_interaction, description, title=None, color=discord.Color.purple(), thumbnail=None, view=None):
+    async def send_embed(self, ctx_or_interaction, description, title=None, color=discord.Color.purple(), thumbnail=None, view=None, footer=None):
         logger.debug(f"send_embed: Sending Embed -> Title: {title}, Description: {description[:60]}...")
+        if ctx_or_interaction is None:
+            # Playback started by the bot itself (e.g. a restored queue) has nobody to answer
+            return None
         embed = discord.Embed(description=description, color=color)
         if title:
             embed.title = title
         if thumbnail:
             embed.set_thumbnail(url=thumbnail)
+        if footer:
+            embed.set_footer(text=footer)
         
+        # discord.py rejects an explicit view=None, so only pass a view when there is one
+        kwargs = {'embed': embed}
+        if view is not None:
+            kwargs['view'] = view
+
         msg = None
         if isinstance(ctx_or_interaction, commands.Context):
-            msg = await ctx_or_interaction.send(embed=embed, view=view)
+            msg = await ctx_or_interaction.send(**kwargs)
         else:
             # Handle interaction - check if already responded or deferred
             try:
                 if ctx_or_interaction.response.is_done():
                     # Already responded, use followup
-                    msg = await ctx_or_interaction.followup.send(embed=embed, view=view)
+                    msg = await ctx_or_interaction.followup.send(**kwargs)
                 else:
-                    await ctx_or_interaction.response.send_message(embed=embed, view=view)
+                    await ctx_or_interaction.response.send_message(**kwargs)
                     # interaction.response.send_message returns None;
                     # fetch the actual message so the view can edit it on timeout
                     msg = await ctx_or_interaction.original_response()
             except discord.errors.InteractionResponded:
-                msg = await ctx_or_interaction.followup.send(embed=embed, view=view)
+                msg = await ctx_or_interaction.followup.send(**kwargs)
         
         # Store message reference on the view so on_timeout can disable buttons
         if view is not None and msg is not None:
             view.message = msg
+        return msg
+
+    async def _resolve_stream(self, track, guild_id=None):
+        """Return a playable stream URL for a queued track, reusing a fresh prefetched one."""
+        if has_fresh_stream_url(track):
+            logger.debug(f"_resolve_stream: Using prefetched stream URL for '{track.title}'")
+            return track.stream_url
+        info = await self.extraction_cache.get_or_extract(track.source, partial(self._extract_info, guild_id=guild_id))
+        logger.debug(f"_resolve_stream: Resolved stream URL -> {info['url']}")
+        track.stream_url = info['url']
+        track.stream_expires = info['expires']
+        track.stream_codec = info.get('acodec')
+        return track.stream_url
+
+    async def _extract_info(self, url, guild_id=None):
+        return await self.extraction_pool.run(extract_stream_info, url, guild_id=guild_id)
+
+    async def _search_videos(self, query, guild_id=None):
+        return await self.extraction_pool.run(search_yt_videos, query, 5, guild_id=guild_id)
+
+    def _schedule_prefetch(self, guild_id: int):
+        """Start resolving the next queued songs in the background if not already doing so."""
+        state = self.get_guild_state(guild_id)
+        if state.prefetch_task is not None and not state.prefetch_task.done():
+            return
+        if not state.music_queue:
+            return
+        state.prefetch_task = asyncio.create_task(self._prefetch_upcoming(guild_id))
 
-    def search_yt(self, item):
-        logger.debug(f"search_yt: Searching YouTube for '{item}'")
-        try:
-            search = VideosSearch(item, limit=1)
-            results = search.result()["result"]
-            if not results:
-                logger.warning("search_yt: No results found")
-                return None
-            result = results[0]
-            logger.debug(f"search_yt: Found video -> Title: {result['title']}, Link: {result['link']}")
-            thumbnails = result.get("thumbnails")
-            thumbnail_url = None
-            if thumbnails and len(thumbnails) > 0:
-                thumbnail_url = thumbnails[0].get("url")
-            return {
-                'source': result["link"],
-                'title': result["title"],
-                'duration': result["duration"],
-                'thumbnail': thumbnail_url
-            }
-        except Exception as e:
-            logger.error(f"search_yt: Failed to find or parse results. Error: {e}")
-            return None
+    async def _prefetch_upcoming(self, guild_id: int):
+        """Resolve stream URLs for the next PREFETCH_DEPTH songs while the current one plays."""
+        state = self.get_guild_state(guild_id)
+        for track in state.music_queue.peek(PREFETCH_DEPTH):
+            if has_fresh_stream_url(track):
+                continue
+            try:
+                await self._resolve_stream(track, guild_id)
+                logger.debug(f"_prefetch_upcoming: Prefetched stream URL for '{track.title}'")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # play_next will retry the extraction and skip the song if it still fails
+                logger.warning(f"_prefetch_upcoming: Could not prefetch '{track.title}' -> {e}")
+
+    def _start_playback(self, guild_id: int, track, stream_url, start_offset=0.0, attempt=0):
+        """Start FFmpeg for stream_url on the guild's voice client, optionally seeking to start_offset."""
+        state = self.get_guild_state(guild_id)
+        before_options = self.FFMPEG_OPTIONS['before_options']
+        if start_offset:
+            before_options += f" -ss {start_offset:.2f}"
+        error_log = FFmpegErrorLog()
+        if OPUS_PASSTHROUGH and state.volume == 1.0:
+            codec = 'copy' if track.stream_codec == 'opus' else None
+            logger.debug(f"_start_playback: Opus passthrough (codec={codec or 'libopus'}) for '{track.title}'")
+            source = TrackedOpusSource(
+                stream_url, track, error_log, start_offset=start_offset, attempt=attempt,
+                codec=codec, before_options=before_options, options=self.FFMPEG_OPTIONS['options']
+            )
+        else:
+            source = TrackedPCMSource(
+                discord.FFmpegPCMAudio(stream_url, before_options=before_options, options=self.FFMPEG_OPTIONS['options'], stderr=error_log),
+                track, error_log, start_offset=start_offset, attempt=attempt, volume=state.volume
+            )
+
+        def _after_play(error):
+            if error:
+                logger.error(f"_start_playback: Playback error -> {error}")
+            asyncio.run_coroutine_threadsafe(self._on_track_end(guild_id, source), self.bot.loop)
+
+        state.source = source
+        state.vc.play(source, after=_after_play)
+        # Have the lyrics ready by the time someone asks for them
+        self.lyrics_service.prefetch(track.title)
+
+    async def _restart_playback(self, guild_id: int):
+        """Restart the current track at its current position, e.g. to switch playback mode."""
+        state = self.get_guild_state(guild_id)
+        source = state.source
+        if source is None or state.vc is None or not (state.vc.is_playing() or state.vc.is_paused()):
+            return
+        stream_url = await self._resolve_stream(source.track, guild_id)
+        source.replaced = True
+        state.vc.stop()
+        self._start_playback(guild_id, source.track, stream_url, start_offset=source.position, attempt=source.attempt)
+        if state.is_paused:
+            state.vc.pause()
+
+    async def _on_track_end(self, guild_id: int, source):
+        """Resume a track whose stream URL was refused mid-playback, otherwise advance the queue."""
+        state = self.guild_states.get(guild_id)
+        # A parked or removed guild must not be brought back by its last track ending
+        if source.replaced or state is None:
+            source.error_log.close()
+            return
+        track = source.track
+        stream_refused = source.error_log.stream_refused()
+        source.error_log.close()
+        if (stream_refused and state.current_song is track
+                and source.attempt < MAX_STREAM_RESUMES
+                and state.vc is not None and state.vc.is_connected()):
+            logger.info(f"_on_track_end: Stream for '{track.title}' was refused at {source.position:.1f}s, re-resolving.")
+            # Drop the stale URL everywhere so the next lookup goes back to yt-dlp
+            self.extraction_cache.invalidate(get_video_id(track.source))
+            track.stream_url = None
+            try:
+                stream_url = await self._resolve_stream(track, guild_id)
+                self._start_playback(guild_id, track, stream_url, start_offset=source.position, attempt=source.attempt + 1)
+                return
+            except Exception as e:
+                logger.error(f"_on_track_end: Could not resume '{track.title}' -> {e}")
+        await self.play_next(guild_id)
 
     async def play_next(self, guild_id: int):
         logger.debug("play_next: Checking queue to play next song...")
-        state = self.get_guild_state(guild_id)
-        
+        state = self.guild_states.get(guild_id)
+        if state is None:
+            return
+        state.last_active = time.monotonic()
+
         if len(state.music_queue) > 0:
             state.is_playing = True
-            state.current_song = state.music_queue.pop(0)
-            m_url = state.current_song[0]['source']
-            logger.debug(f"play_next: Next song URL -> {m_url}")
-            
-            loop = asyncio.get_running_loop()
+            state.current_song = state.music_queue.popleft()
+            logger.debug(f"play_next: Next song URL -> {state.current_song.source}")
+
             try:
-                data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(m_url, download=False))
-                logger.debug(f"play_next: Received data from ytdl -> {data.get('url', 'No URL')}")
-                song = data['url']
+                song = await self._resolve_stream(state.current_song, guild_id)
             except Exception as e:
                 logger.error(f"play_next: Error extracting info with yt-dlp -> {e}")
                 state.current_song = None
                 # Skip to the next song iteratively to avoid deep recursion
                 while len(state.music_queue) > 0:
-                    state.current_song = state.music_queue.pop(0)
+                    state.current_song = state.music_queue.popleft()
                     try:
-                        next_url = state.current_song[0]['source']
-                        data = await loop.run_in_executor(None, lambda u=next_url: self.ytdl.extract_info(u, download=False))
-                        song = data['url']
+                        song = await self._resolve_stream(state.current_song, guild_id)
                         break
                     except Exception as e2:
                         logger.error(f"play_next: Skipping failed song -> {e2}")
@@ -199,26 +1140,23 @@ class MusicCog(commands.Cog):
                     state.is_playing = False
                     state.current_song = None
                     return
-            
+
             if state.vc is None or not state.vc.is_connected():
                 logger.warning("play_next: Voice client disconnected, cannot play next song.")
                 state.is_playing = False
                 state.current_song = None
                 return
 
-            source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(song, **self.FFMPEG_OPTIONS))
             logger.debug("play_next: Attempting to play the next song.")
-            
-            def _after_play(error):
-                if error:
-                    logger.error(f"play_next: Playback error -> {error}")
-                asyncio.run_coroutine_threadsafe(self.play_next(guild_id), self.bot.loop)
-
-            state.vc.play(source, after=_after_play)
+            self._start_playback(guild_id, state.current_song, song, start_offset=state.current_song.resume_at)
+            state.current_song.resume_at = 0.0
+            self._schedule_prefetch(guild_id)
         else:
             logger.debug("play_next: Queue is empty, stopping playback.")
             state.is_playing = False
             state.current_song = None
+            state.source = None
+            self.queue_store.mark_dirty(guild_id)
 
     async def play_music(self, ctx_or_interaction, guild_id: int):
         logger.debug("play_music: Checking if queue has songs...")
@@ -226,11 +1164,10 @@ class MusicCog(commands.Cog):
         
         if len(state.music_queue) > 0:
             state.is_playing = True
-            state.current_song = state.music_queue.pop(0)
-            m_url = state.current_song[0]['source']
-            voice_channel = state.current_song[1]
-            song_title = state.current_song[0]['title']
-            song_duration = state.current_song[0]['duration']
+            state.current_song = state.music_queue.popleft()
+            m_url = state.current_song.source
+            voice_channel = state.current_song.channel
+            song_title = state.current_song.title
 
             logger.debug(f"play_music: Song title -> {song_title}, URL -> {m_url}")
 
@@ -248,11 +1185,8 @@ class MusicCog(commands.Cog):
                 await self.send_embed(ctx_or_interaction, f"Could not connect to the voice channel: {str(e)}", title="Error", color=discord.Color.red())
                 return
 
-            loop = asyncio.get_running_loop()
             try:
-                data = await loop.run_in_executor(None, lambda: self.ytdl.extract_info(m_url, download=False))
-                logger.debug(f"play_music: Extracted data from ytdl -> {data.get('url', 'No URL')}")
-                song = data['url']
+                song = await self._resolve_stream(state.current_song, guild_id)
             except Exception as e:
                 logger.error(f"play_music: Error extracting info with yt-dlp -> {e}")
                 state.is_playing = False
@@ -260,16 +1194,10 @@ class MusicCog(commands.Cog):
                 await self.send_embed(ctx_or_interaction, f"Error extracting info: {str(e)}", title="Error", color=discord.Color.red())
                 return
 
-            source = discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(song, **self.FFMPEG_OPTIONS))
-
             logger.debug("play_music: Attempting to play the current song.")
-
-            def _after_play(error):
-                if error:
-                    logger.error(f"play_music: Playback error -> {error}")
-                asyncio.run_coroutine_threadsafe(self.play_next(guild_id), self.bot.loop)
-
-            state.vc.play(source, after=_after_play)
+            self._start_playback(guild_id, state.current_song, song, start_offset=state.current_song.resume_at)
+            state.current_song.resume_at = 0.0
+            self._schedule_prefetch(guild_id)
         else:
             logger.debug("play_music: Queue is empty, no song to play.")
             state.is_playing = False
@@ -280,14 +1208,10 @@ class MusicCog(commands.Cog):
         if not current:
             return []
         try:
-            loop = asyncio.get_running_loop()
-            def _search():
-                search = VideosSearch(current, limit=5)
-                return search.result()["result"]
-            results = await loop.run_in_executor(None, _search)
+            results = await self.autocomplete.suggest(interaction.user.id, current, guild_id=interaction.guild_id)
             return [
-                app_commands.Choice(name=f"{video['title'][:80]} - {video['duration']}", value=video["link"])
-                for video in results
+                app_commands.Choice(name=f"{title[:80]} - {duration}", value=link)
+                for title, duration, link in results
             ]
         except Exception as e:
             logger.error(f"play_autocomplete: Error during autocomplete: {e}")
@@ -298,7 +1222,7 @@ class MusicCog(commands.Cog):
         logger.info(f"command:play: Called with query -> {query}")
         await self._play(ctx, query)
 
-    @app_commands.command(name="play", description="Plays a selected song from YouTube")
+    @app_commands.command(name="play", description="Plays a song, a playlist URL or several comma-separated songs from YouTube")
     @app_commands.autocomplete(query=play_autocomplete)
     async def slash_play(self, interaction: discord.Interaction, query: str):
         logger.info(f"slash command:play: Called with query -> {query}")
@@ -332,14 +1256,25 @@ class MusicCog(commands.Cog):
             await self.send_embed(ctx_or_interaction, "You need to connect to a voice channel first!", title="Error", color=discord.Color.red())
             return
 
-        loop = asyncio.get_running_loop()
-        song = await loop.run_in_executor(None, self.search_yt, query)
+        queries = split_queries(query)
+        if len(queries) > 1 or (queries and is_playlist_url(queries[0])):
+            await self._enqueue_bulk(ctx_or_interaction, guild_id, voice_channel, queries[:MAX_BULK_QUERIES])
+            return
+
+        if self.extraction_pool.is_saturated:
+            await self.send_embed(ctx_or_interaction, "The music service is busy right now, your song will be added shortly...", color=discord.Color.orange())
+        try:
+            song = await self.extraction_pool.run(search_yt, query, guild_id=guild_id)
+        except (ExtractionPoolBusy, asyncio.TimeoutError) as e:
+            logger.warning(f"_play: Search rejected by extraction pool -> {e!r}")
+            await self.send_embed(ctx_or_interaction, "The music service is overloaded. Please try again in a moment.", title="Error", color=discord.Color.red())
+            return
         if song is None:
             logger.warning("_play: search_yt returned None.")
             await self.send_embed(ctx_or_interaction, "Could not download the song. Incorrect format or unsupported type. Please try another keyword.", title="Error", color=discord.Color.red())
             return
 
-        state.music_queue.append([song, voice_channel])
+        state.music_queue.append(Track.from_search(song, voice_channel))
         logger.info(f"_play: Added song '{song['title']}' to queue. Queue length is now {len(state.music_queue)}")
 
         view = MusicControlView(self, guild_id)
@@ -357,6 +1292,7 @@ class MusicCog(commands.Cog):
             )
         elif state.is_playing:
             logger.debug("_play: Already playing, just adding to queue.")
+            self._schedule_prefetch(guild_id)
             await self.send_embed(
                 ctx_or_interaction, 
                 f"**#{len(state.music_queue)} - '{song['title']}'** (Duration: {song['duration']}) added to the queue", 
@@ -375,6 +1311,70 @@ class MusicCog(commands.Cog):
             )
             await self.play_music(ctx_or_interaction, guild_id)
 
+    async def _enqueue_bulk(self, ctx_or_interaction, guild_id: int, voice_channel, queries):
+        """Resolve several queries and/or playlist URLs concurrently and queue the results in order.
+
+        Progress is reported by editing a single message instead of sending one per song.
+        """
+        logger.info(f"_enqueue_bulk: Resolving {len(queries)} item(s) for guild {guild_id}")
+        state = self.get_guild_state(guild_id)
+        progress = await self.send_embed(ctx_or_interaction, f"Resolving {len(queries)} item(s)...", color=discord.Color.orange())
+        semaphore = asyncio.Semaphore(BULK_RESOLVE_CONCURRENCY)
+
+        async def resolve(item):
+            async with semaphore:
+                if is_playlist_url(item):
+                    return await self.extraction_pool.run(extract_playlist_entries, item, guild_id=guild_id)
+                song = await self.extraction_pool.run(search_yt, item, guild_id=guild_id)
+                return [song] if song else []
+
+        tasks = [asyncio.ensure_future(resolve(item)) for item in queries]
+        added = 0
+        failed = 0
+        last_edit = time.monotonic()
+        try:
+            # Await in request order so the queue keeps the order the user typed
+            for done, task in enumerate(tasks, start=1):
+                try:
+                    songs = await task
+                except Exception as e:
+                    logger.warning(f"_enqueue_bulk: Could not resolve item {done} -> {e!r}")
+                    songs = []
+                if not songs:
+                    failed += 1
+                    continue
+
+                for song in songs:
+                    state.music_queue.append(Track.from_search(song, voice_channel))
+                added += len(songs)
+
+                if not state.is_playing and not state.is_paused:
+                    await self.play_music(ctx_or_interaction, guild_id)
+                else:
+                    self._schedule_prefetch(guild_id)
+
+                if progress is not None and time.monotonic() - last_edit >= BULK_PROGRESS_INTERVAL:
+                    last_edit = time.monotonic()
+                    await self._edit_progress(progress, f"Queued {added} song(s) from {done}/{len(queries)} item(s)...", discord.Color.orange())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        summary = f"Added **{added}** song(s) to the queue."
+        if failed:
+            summary += f" {failed} item(s) could not be found."
+        color = discord.Color.green() if added else discord.Color.red()
+        if progress is not None:
+            await self._edit_progress(progress, summary, color)
+        else:
+            await self.send_embed(ctx_or_interaction, summary, color=color)
+
+    async def _edit_progress(self, message, description, color):
+        try:
+            await message.edit(embed=discord.Embed(description=description, color=color))
+        except discord.HTTPException as e:
+            logger.warning(f"_edit_progress: Could not edit progress message -> {e}")
+
     @commands.command(name="pause", help="Pauses the current song being played")
     async def pause(self, ctx):
         logger.info("command:pause called.")
@@ -518,8 +1518,8 @@ class MusicCog(commands.Cog):
             await self.send_embed(ctx_or_interaction, "No song information available.", title="Error", color=discord.Color.red())
             return
 
-        logger.debug(f"_lyrics: Current song title -> {state.current_song[0]['title']}")
-        artist, song_title = extract_artist_and_song(state.current_song[0]['title'])
+        logger.debug(f"_lyrics: Current song title -> {state.current_song.title}")
+        artist, song_title = extract_artist_and_song(state.current_song.title)
         logger.debug(f"_lyrics: Extracted -> Artist: {artist}, Title: {song_title}")
 
         if not artist or not song_title:
@@ -527,31 +1527,24 @@ class MusicCog(commands.Cog):
             await self.send_embed(ctx_or_interaction, "Could not determine artist and song title for lyrics.", title="Error", color=discord.Color.red())
             return
 
-        lyrics_url = f"https://api.lyrics.ovh/v1/{artist}/{song_title}"
-        logger.debug(f"_lyrics: Lyrics URL -> {lyrics_url}")
-
-        # Use async HTTP request instead of blocking requests
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(lyrics_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        lyrics = data.get('lyrics', None)
-                        if lyrics:
-                            # Truncate lyrics if too long for Discord embed
-                            if len(lyrics) > 4000:
-                                lyrics = lyrics[:4000] + "\n\n...(lyrics truncated)"
-                            logger.info("_lyrics: Lyrics found, sending embed.")
-                            await self.send_embed(ctx_or_interaction, f"**Lyrics for '{song_title}':**\n\n{lyrics}", color=discord.Color.green())
-                        else:
-                            logger.warning("_lyrics: Lyrics not found in API response.")
-                            await self.send_embed(ctx_or_interaction, "Lyrics not found.", title="Error", color=discord.Color.red())
-                    else:
-                        logger.warning("_lyrics: Failed to fetch lyrics from API.")
-                        await self.send_embed(ctx_or_interaction, "Could not fetch lyrics.", title="Error", color=discord.Color.red())
-        except aiohttp.ClientError as e:
-            logger.error(f"_lyrics: HTTP error fetching lyrics: {e}")
+            lyrics = await self.lyrics_service.get(artist, song_title)
+        except LyricsFetchError as e:
+            logger.error(f"_lyrics: Error fetching lyrics: {e}")
             await self.send_embed(ctx_or_interaction, "Could not fetch lyrics.", title="Error", color=discord.Color.red())
+            return
+
+        if not lyrics:
+            logger.warning("_lyrics: Lyrics not found.")
+            await self.send_embed(ctx_or_interaction, "Lyrics not found.", title="Error", color=discord.Color.red())
+            return
+
+        logger.info("_lyrics: Lyrics found, sending embed.")
+        heading = f"**Lyrics for '{song_title}':**\n\n"
+        pages = paginate_lyrics(lyrics)
+        view = LyricsView(heading, pages) if len(pages) > 1 else None
+        await self.send_embed(ctx_or_interaction, heading + pages[0], color=discord.Color.green(),
+                              view=view, footer=view.footer() if view else None)
 
     # Queue
     @commands.command(name="queue", help="Displays the current song queue")
@@ -579,15 +1572,17 @@ class MusicCog(commands.Cog):
         
         state = self.get_guild_state(guild_id)
         
-        retval = ""
-        for i in range(len(state.music_queue)):
-            song_title = state.music_queue[i][0]['title']
-            song_duration = state.music_queue[i][0]['duration']
-            retval += f"#{i + 1} - {song_title} ({song_duration})\n"
-
-        if retval:
+        if len(state.music_queue) > 0:
             logger.debug("_queue: Queue contents found.")
-            await self.send_embed(ctx_or_interaction, f"**Queue:**\n{retval}", color=discord.Color.orange())
+            queue = state.music_queue
+            view = QueueView(self, guild_id) if queue.page_count() > 1 else None
+            await self.send_embed(
+                ctx_or_interaction,
+                f"**Queue:**\n{queue.render_page(0)}",
+                color=discord.Color.orange(),
+                view=view,
+                footer=queue_footer(queue, 0)
+            )
         else:
             logger.debug("_queue: Queue is empty.")
             await self.send_embed(ctx_or_interaction, "No music in queue", title="Queue", color=discord.Color.red())
@@ -617,13 +1612,7 @@ class MusicCog(commands.Cog):
         
         state = self.get_guild_state(guild_id)
         
-        if state.vc is not None:
-            await state.vc.disconnect()
-        state.is_playing = False
-        state.is_paused = False
-        state.music_queue.clear()
-        state.current_song = None
-        state.vc = None
+        await self._reset_guild_state(state, disconnect=True)
         await self.send_embed(ctx_or_interaction, "Stopped playing music and cleared the queue.", color=discord.Color.red())
 
     # Now Playing
@@ -653,15 +1642,15 @@ class MusicCog(commands.Cog):
         state = self.get_guild_state(guild_id)
 
         if state.current_song is not None and (state.is_playing or state.is_paused):
-            song = state.current_song[0]
+            track = state.current_song
             status = "⏸️ Paused" if state.is_paused else "▶️ Playing"
             view = MusicControlView(self, guild_id)
             await self.send_embed(
                 ctx_or_interaction,
-                f"{status}: **{song['title']}**\nDuration: {song['duration']}",
+                f"{status}: **{track.title}**\nDuration: {track.duration}",
                 title="Now Playing",
                 color=discord.Color.green(),
-                thumbnail=song.get('thumbnail'),
+                thumbnail=track.thumbnail,
                 view=view
             )
         else:
@@ -704,14 +1693,183 @@ class MusicCog(commands.Cog):
             )
             return
 
-        removed = state.music_queue.pop(index)
-        removed_title = removed[0]['title']
+        removed = state.music_queue.remove(index)
+        removed_title = removed.title
         await self.send_embed(
             ctx_or_interaction,
             f"Removed **{removed_title}** from position #{position} in the queue.",
             color=discord.Color.green()
         )
 
+    # Move within queue
+    @app_commands.command(name="move", description="Move a song to another position in the queue")
+    @app_commands.describe(position="Current position in queue (1, 2, 3...)", new_position="New position in queue")
+    async def slash_move(self, interaction: discord.Interaction, position: int, new_position: int):
+        logger.info(f"slash command:move called with {position} -> {new_position}.")
+        await self._move(interaction, position, new_position)
+
+    @commands.command(name="move", aliases=["mv"], help="Move a song to another position in the queue")
+    async def move(self, ctx, position: int, new_position: int):
+        logger.info(f"command:move called with {position} -> {new_position}.")
+        await self._move(ctx, position, new_position)
+
+    async def _move(self, ctx_or_interaction, position: int, new_position: int):
+        logger.debug(f"_move: Moving position {position} to {new_position}.")
+        if isinstance(ctx_or_interaction, commands.Context):
+            if ctx_or_interaction.guild is None:
+                await ctx_or_interaction.send("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild.id
+        else:
+            if ctx_or_interaction.guild_id is None:
+                await ctx_or_interaction.response.send_message("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild_id
+
+        state = self.get_guild_state(guild_id)
+        size = len(state.music_queue)
+
+        if not (1 <= position <= size and 1 <= new_position <= size):
+            await self.send_embed(
+                ctx_or_interaction,
+                f"Invalid position. Queue has {size} song(s).",
+                title="Error",
+                color=discord.Color.red()
+            )
+            return
+
+        moved = state.music_queue.move(position - 1, new_position - 1)
+        self._schedule_prefetch(guild_id)
+        await self.send_embed(
+            ctx_or_interaction,
+            f"Moved **{moved.title}** from position #{position} to #{new_position}.",
+            color=discord.Color.green()
+        )
+
+    # Shuffle queue
+    @app_commands.command(name="shuffle", description="Shuffle the songs in the queue")
+    async def slash_shuffle(self, interaction: discord.Interaction):
+        logger.info("slash command:shuffle called.")
+        await self._shuffle(interaction)
+
+    @commands.command(name="shuffle", help="Shuffle the songs in the queue")
+    async def shuffle(self, ctx):
+        logger.info("command:shuffle called.")
+        await self._shuffle(ctx)
+
+    async def _shuffle(self, ctx_or_interaction):
+        logger.debug("_shuffle: Shuffling queue.")
+        if isinstance(ctx_or_interaction, commands.Context):
+            if ctx_or_interaction.guild is None:
+                await ctx_or_interaction.send("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild.id
+        else:
+            if ctx_or_interaction.guild_id is None:
+                await ctx_or_interaction.response.send_message("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild_id
+
+        state = self.get_guild_state(guild_id)
+
+        if len(state.music_queue) < 2:
+            await self.send_embed(ctx_or_interaction, "Not enough songs in the queue to shuffle.", color=discord.Color.red())
+            return
+
+        state.music_queue.shuffle()
+        self._schedule_prefetch(guild_id)
+        await self.send_embed(ctx_or_interaction, f"Shuffled {len(state.music_queue)} songs in the queue.", color=discord.Color.green())
+
+    # Volume
+    @app_commands.command(name="volume", description="Set the playback volume")
+    @app_commands.describe(level="Volume in percent (0-200, default 100)")
+    async def slash_volume(self, interaction: discord.Interaction, level: app_commands.Range[int, 0, 200]):
+        logger.info(f"slash command:volume called with level {level}.")
+        await self._volume(interaction, level)
+
+    @commands.command(name="volume", aliases=["vol"], help="Set the playback volume (0-200)")
+    async def volume(self, ctx, level: int):
+        logger.info(f"command:volume called with level {level}.")
+        await self._volume(ctx, level)
+
+    async def _volume(self, ctx_or_interaction, level: int):
+        logger.debug(f"_volume: Setting volume to {level}%.")
+        if isinstance(ctx_or_interaction, commands.Context):
+            if ctx_or_interaction.guild is None:
+                await ctx_or_interaction.send("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild.id
+        else:
+            if ctx_or_interaction.guild_id is None:
+                await ctx_or_interaction.response.send_message("Music commands can only be used in a server.")
+                return
+            guild_id = ctx_or_interaction.guild_id
+
+        if not 0 <= level <= 200:
+            await self.send_embed(ctx_or_interaction, "Volume must be between 0 and 200.", title="Error", color=discord.Color.red())
+            return
+
+        state = self.get_guild_state(guild_id)
+        state.volume = level / 100
+        source = state.source
+        if isinstance(source, TrackedPCMSource):
+            source.volume = state.volume
+        elif source is not None and state.volume != 1.0:
+            # Opus passthrough cannot scale audio; switch the current track to the PCM path
+            try:
+                await self._restart_playback(guild_id)
+            except Exception as e:
+                logger.error(f"_volume: Could not restart playback -> {e}")
+        await self.send_embed(ctx_or_interaction, f"Volume set to **{level}%**.", color=discord.Color.green())
+
+
+def queue_footer(queue, page):
+    return f"Page {page + 1}/{queue.page_count()} • {len(queue)} song(s) • Total: {format_duration(queue.total_seconds)}"
+
+
+class QueueView(discord.ui.View):
+    """Previous/Next navigation for /queue; each page is rendered only when shown."""
+    def __init__(self, cog: MusicCog, guild_id: int):
+        super().__init__(timeout=300)  # 5 minute timeout
+        self.cog = cog
+        self.guild_id = guild_id
+        self.page = 0
+        self.message = None
+
+    async def on_timeout(self):
+        """Disable all buttons when the view times out."""
+        for item in self.children:
+            item.disabled = True
+        try:
+            if self.message:
+                await self.message.edit(view=self)
+        except Exception:
+            pass
+
+    async def _show_page(self, interaction: discord.Interaction, page: int):
+        queue = self.cog.get_guild_state(self.guild_id).music_queue
+        # The queue may have shrunk since the message was sent
+        self.page = max(0, min(page, queue.page_count() - 1))
+        if len(queue) > 0:
+            description = f"**Queue:**\n{queue.render_page(self.page)}"
+            color = discord.Color.orange()
+        else:
+            description = "No music in queue"
+            color = discord.Color.red()
+        embed = discord.Embed(description=description, color=color)
+        embed.set_footer(text=queue_footer(queue, self.page))
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        logger.debug("QueueView: Previous button clicked.")
+        await self._show_page(interaction, self.page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        logger.debug("QueueView: Next button clicked.")
+        await self._show_page(interaction, self.page + 1)
+
 
 class MusicControlView(discord.ui.View):
     def __init__(self, cog: MusicCog, guild_id: int):
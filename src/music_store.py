@@ -0,0 +1,108 @@
+import json
+import logging
+import sqlite3
+import time
+
+from src.db import db
+
+logger = logging.getLogger(__name__)
+
+
+def _write_snapshots(snapshots):
+    """Persist a batch of (guild_id, tracks, position) in a single transaction.
+
+    An empty track list deletes the guild's row.
+    """
+    now = time.time()
+    with db.transaction() as conn:
+        for guild_id, tracks, position in snapshots:
+            if tracks:
+                conn.execute(
+                    "INSERT INTO music_queues (guild_id, tracks, position, updated_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(guild_id) DO UPDATE SET tracks = excluded.tracks, "
+                    "position = excluded.position, updated_at = excluded.updated_at",
+                    (guild_id, json.dumps(tracks), position, now)
+                )
+            else:
+                conn.execute("DELETE FROM music_queues WHERE guild_id = ?", (guild_id,))
+
+
+def _saved_guilds():
+    return [row[0] for row in db.fetchall("SELECT guild_id FROM music_queues")]
+
+
+def _read_snapshot(guild_id):
+    """Return (tracks, position) saved for a guild, or None."""
+    row = db.fetchone("SELECT tracks, position FROM music_queues WHERE guild_id = ?", (guild_id,))
+    if row is None:
+        return None
+    return json.loads(row[0]), row[1]
+
+
+class QueueStore:
+    """Write-behind persistence of guild music queues.
+
+    Callers only mark guilds dirty; flush() snapshots them on the event loop and writes
+    the whole batch from a worker thread, so playback never waits on disk.
+    """
+    def __init__(self):
+        self._dirty = set()
+        self._restored = set()
+        self.closed = False
+
+    def mark_dirty(self, guild_id):
+        if not self.closed:
+            self._dirty.add(guild_id)
+
+    def forget(self, guild_id):
+        """Drop a guild's pending changes and restore its saved queue again on next use."""
+        self._dirty.discard(guild_id)
+        self._restored.discard(guild_id)
+
+    def needs_restore(self, guild_id):
+        """True the first time a guild is seen since startup."""
+        return guild_id not in self._restored
+
+    async def restore(self, loop, guild_id):
+        """Load a guild's saved queue once per process lifetime."""
+        self._restored.add(guild_id)
+        try:
+            return await loop.run_in_executor(None, _read_snapshot, guild_id)
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"QueueStore: Could not restore queue for guild {guild_id}: {e}")
+            return None
+
+    async def saved_guilds(self, loop):
+        """IDs of every guild with a saved queue."""
+        try:
+            return await loop.run_in_executor(None, _saved_guilds)
+        except sqlite3.Error as e:
+            logger.error(f"QueueStore: Could not list saved queues: {e}")
+            return []
+
+    async def delete(self, loop, guild_id):
+        """Remove a guild's saved queue, e.g. when the bot leaves the guild."""
+        self._dirty.discard(guild_id)
+        self._restored.add(guild_id)
+        try:
+            await loop.run_in_executor(None, _write_snapshots, [(guild_id, [], 0.0)])
+        except sqlite3.Error as e:
+            logger.error(f"QueueStore: Could not delete queue for guild {guild_id}: {e}")
+
+    async def flush(self, loop, snapshot):
+        """Write every dirty guild using snapshot(guild_id) -> (tracks, position)."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        snapshots = [(guild_id, *snapshot(guild_id)) for guild_id in dirty]
+        try:
+            await loop.run_in_executor(None, _write_snapshots, snapshots)
+        except sqlite3.Error as e:
+            logger.error(f"QueueStore: Failed to persist {len(snapshots)} queue(s): {e}")
+            # Retry on the next flush unless they changed again in the meantime
+            self._dirty.update(dirty)
+
+    async def close(self, loop, snapshot):
+        """Flush outstanding changes and ignore any made afterwards (e.g. by shutdown disconnects)."""
+        await self.flush(loop, snapshot)
+        self.closed = True
@@ -1,12 +1,10 @@
-import os
 import logging
-import sqlite3
 import discord
 from discord.ext import commands
-from discord import app_commands
 from datetime import date
 from discord.ui import Select, View
-from pathlib import Path
+
+from src.db import async_db
 
 logger = logging.getLogger(__name__)
 
@@ -18,81 +16,73 @@ status_emojis = {
     "completed": "✅"  # Green checkmark
 }
 
-# Get absolute path for database
-SCRIPT_DIR = Path(__file__).parent.parent.absolute()
-DB_FOLDER = SCRIPT_DIR / 'db'
-DB_FILE = DB_FOLDER / 'tasks.db'
-
-
-def ensure_db_exists():
-    """Ensure database and tables exist. Does not return a connection."""
-    if not DB_FOLDER.exists():
-        DB_FOLDER.mkdir(parents=True)
-        logger.info(f"Created folder: {DB_FOLDER}")
-
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS tasks (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        task TEXT NOT NULL,
-                        user_id INTEGER NOT NULL,
-                        date TEXT NOT NULL,
-                        status TEXT DEFAULT 'to-do',
-                        guild_id INTEGER DEFAULT 0
-                    )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY,
-                        username TEXT NOT NULL
-                    )''')
-        # Migration: add guild_id column if missing (for existing databases)
-        columns = [row[1] for row in c.execute("PRAGMA table_info(tasks)").fetchall()]
-        if 'guild_id' not in columns:
-            c.execute("ALTER TABLE tasks ADD COLUMN guild_id INTEGER DEFAULT 0")
-
-
-def add_task_to_db(task, user_id, task_date, guild_id=0, status='to-do'):
+def add_task_to_db(conn, task, user_id, task_date, guild_id=0, status='to-do'):
     """Add a task for a specific user, date, guild and default status."""
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO tasks (task, user_id, date, status, guild_id) VALUES (?, ?, ?, ?, ?)", 
-                  (task, user_id, task_date, status, guild_id))
+    conn.execute("INSERT INTO tasks (task, user_id, date, status, guild_id) VALUES (?, ?, ?, ?, ?)",
+                 (task, user_id, task_date, status, guild_id))
     logger.info(f"Task '{task}' with status '{status}' added for user {user_id} on date {task_date} in guild {guild_id}")
 
 
-def add_user_to_db(user_id, username):
+def add_user_to_db(conn, user_id, username):
     """Ensure user exists in database."""
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute("SELECT id FROM users WHERE id = ?", (user_id,))
-        user = c.fetchone()
-
-        if user is None:
-            c.execute("INSERT INTO users (id, username) VALUES (?, ?)", (user_id, username))
-            logger.info(f"Added user {username} with ID {user_id}")
+    c = conn.execute("INSERT OR IGNORE INTO users (id, username) VALUES (?, ?)", (user_id, username))
+    if c.rowcount:
+        logger.info(f"Added user {username} with ID {user_id}")
 
 
-def get_tasks_by_user(user_id, task_date, guild_id=0):
+def get_tasks_by_user(conn, user_id, task_date, guild_id=0):
     """Retrieve tasks by user, date and guild with status and ID."""
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute("SELECT id, task, status FROM tasks WHERE user_id = ? AND date = ? AND guild_id = ?", (user_id, task_date, guild_id))
-        tasks = c.fetchall()
+    tasks = conn.execute("SELECT id, task, status FROM tasks WHERE user_id = ? AND date = ? AND guild_id = ?", (user_id, task_date, guild_id)).fetchall()
     return [(task[0], task[1], task[2]) for task in tasks]  # (id, task, status)
 
 
-def update_task_status(task_id, new_status, user_id=None):
+def update_task_status(conn, task_id, new_status, user_id=None):
     """Update the status of a specific task by its ID, optionally verifying ownership."""
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
+    if user_id is not None:
+        c = conn.execute("UPDATE tasks SET status = ? WHERE id = ? AND user_id = ?", (new_status, task_id, user_id))
+    else:
+        c = conn.execute("UPDATE tasks SET status = ? WHERE id = ?", (new_status, task_id))
+    if c.rowcount == 0:
+        logger.warning(f"Task ID {task_id} not found or not owned by user.")
+    else:
+        logger.info(f"Task ID {task_id} successfully updated to status '{new_status}'.")
+
+
+def _add_task_for_user(conn, task, user_id, username, task_date, guild_id):
+    add_user_to_db(conn, user_id, username)
+    add_task_to_db(conn, task, user_id, task_date, guild_id=guild_id)
+
+
+class TaskRepository:
+    """Async access to the notes tables for the command handlers.
+
+    Reads run on AsyncDatabase's reader threads and writes on its single writer
+    thread, where concurrent commands are committed together; the event loop never
+    touches SQLite.
+    """
+    def __init__(self, database=async_db):
+        self.database = database
+
+    async def add_task(self, task, user_id, username, task_date, guild_id=0):
+        """Add a task, registering its user first if needed."""
+        await self.database.write(_add_task_for_user, task, user_id, username, task_date, guild_id)
+
+    async def get_tasks(self, user_id, task_date, guild_id=0):
+        return await self.database.read(get_tasks_by_user, user_id, task_date, guild_id)
+
+    async def update_status(self, task_id, new_status, user_id=None):
+        await self.database.write(update_task_status, task_id, new_status, user_id)
+
+    async def remove_task(self, user_id, task_id):
+        """Remove a task and return the message to show."""
+        return await self.database.write(remove_task_from_db, user_id, task_id)
+
+    async def edit_task(self, user_id, task_id, new_task_description):
+        """Change a task's description and return the message to show."""
+        return await self.database.write(edit_task_from_db, user_id, task_id, new_task_description)
 
-        if user_id is not None:
-            c.execute("UPDATE tasks SET status = ? WHERE id = ? AND user_id = ?", (new_status, task_id, user_id))
-        else:
-            c.execute("UPDATE tasks SET status = ? WHERE id = ?", (new_status, task_id))
-        if c.rowcount == 0:
-            logger.warning(f"Task ID {task_id} not found or not owned by user.")
-        else:
-            logger.info(f"Task ID {task_id} successfully updated to status '{new_status}'.")
+
+task_repository = TaskRepository()
 
 
 def add_note(bot: commands.Bot):
@@ -104,13 +94,9 @@ def add_note(bot: commands.Bot):
         username = user.name
         today = date.today().isoformat()
 
-        # Ensure database exists
-        ensure_db_exists()
-        
         guild_id = interaction.guild_id or 0
 
-        add_user_to_db(user_id, username)
-        add_task_to_db(task, user_id, today, guild_id=guild_id)
+        await task_repository.add_task(task, user_id, username, today, guild_id=guild_id)
 
         await interaction.followup.send(f"Task '{task}' has been added for {username} with status 'to-do'.")
 
@@ -133,12 +119,9 @@ def get_note(bot: commands.Bot):
             await interaction.followup.send("Invalid date provided. Please check the day, month, and year.")
             return
 
-        # Ensure database exists
-        ensure_db_exists()
-        
         user_id = interaction.user.id
         guild_id = interaction.guild_id or 0
-        tasks = get_tasks_by_user(user_id, task_date, guild_id=guild_id)
+        tasks = await task_repository.get_tasks(user_id, task_date, guild_id=guild_id)
 
         if tasks:
             tasks_message = "\n".join(f"{index + 1}. {status_emojis.get(status, '❓')} {task}" 
@@ -150,24 +133,23 @@ def get_note(bot: commands.Bot):
 
 async def update_task_status_command(interaction: discord.Interaction, task_id: int, status: str):
     """Command to update the status of a task by its database ID."""
+    # Defer before touching the database so a slow write can't miss Discord's 3-second deadline
+    await interaction.response.defer()
     user_id = interaction.user.id
     guild_id = interaction.guild_id or 0
     today = date.today().isoformat()
 
-    # Ensure database exists
-    ensure_db_exists()
-
-    update_task_status(task_id, status, user_id=user_id)
+    await task_repository.update_status(task_id, status, user_id=user_id)
 
     # Re-fetch tasks to reflect updated status
-    tasks = get_tasks_by_user(user_id, today, guild_id=guild_id)
+    tasks = await task_repository.get_tasks(user_id, today, guild_id=guild_id)
     
     if tasks:
         tasks_message = "\n".join(f"{index + 1}. {status_emojis.get(task_status, '❓')} {task_name}" 
                                  for index, (tid, task_name, task_status) in enumerate(tasks))
-        await interaction.response.send_message(f"Task status updated to '{status}'.\n\nHere are your tasks for today:\n{tasks_message}")
+        await interaction.followup.send(f"Task status updated to '{status}'.\n\nHere are your tasks for today:\n{tasks_message}")
     else:
-        await interaction.response.send_message(f"Task status updated to '{status}'.")
+        await interaction.followup.send(f"Task status updated to '{status}'.")
 
 
 class StatusSelect(Select):
@@ -202,17 +184,15 @@ def _make_task_options(tasks):
 def update_status(bot: commands.Bot):
     @bot.tree.command(name="update", description="Update the status of a task")
     async def update_status_(interaction: discord.Interaction):
+        await interaction.response.defer()
         user_id = interaction.user.id
         guild_id = interaction.guild_id or 0
         today = date.today().isoformat()
 
-        # Ensure database exists
-        ensure_db_exists()
-        
-        tasks = get_tasks_by_user(user_id, today, guild_id=guild_id)
+        tasks = await task_repository.get_tasks(user_id, today, guild_id=guild_id)
         
         if not tasks:
-            await interaction.response.send_message("You have no tasks for today.")
+            await interaction.followup.send("You have no tasks for today.")
             return
         
         task_options = _make_task_options(tasks)
@@ -233,40 +213,34 @@ def update_status(bot: commands.Bot):
             await select_interaction.response.send_message(f"Please select the new status for '{task_name}'.", view=status_view)
         
         task_select.callback = task_select_callback
-        await interaction.response.send_message("Please select the task you want to update:", view=view)
+        await interaction.followup.send("Please select the task you want to update:", view=view)
 
 
-def remove_task_from_db(user_id, task_id):
+def remove_task_from_db(conn, user_id, task_id):
     """Remove a task by its database ID, verifying ownership."""
-    # Ensure database exists
-    ensure_db_exists()
-    
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute("SELECT task FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
-        row = c.fetchone()
-        if row is None:
-            return "Task not found or already removed."
-        task_name = row[0]
-        c.execute("DELETE FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
-    
+    c = conn.cursor()
+    c.execute("SELECT task FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
+    row = c.fetchone()
+    if row is None:
+        return "Task not found or already removed."
+    task_name = row[0]
+    c.execute("DELETE FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
+
     return f"Task '{task_name}' has been removed."
 
 
 def remove_task(bot: commands.Bot):
     @bot.tree.command(name="remove", description="Remove a to-do task for today")
     async def remove_task_(interaction: discord.Interaction):
+        await interaction.response.defer()
         user_id = interaction.user.id
         guild_id = interaction.guild_id or 0
         today = date.today().isoformat()
         
-        # Ensure database exists
-        ensure_db_exists()
-        
-        tasks = get_tasks_by_user(user_id, today, guild_id=guild_id)
+        tasks = await task_repository.get_tasks(user_id, today, guild_id=guild_id)
         
         if not tasks:
-            await interaction.response.send_message("You have no tasks for today.")
+            await interaction.followup.send("You have no tasks for today.")
             return
         
         task_options = _make_task_options(tasks)
@@ -280,28 +254,25 @@ def remove_task(bot: commands.Bot):
                 await select_interaction.response.send_message("You cannot interact with this menu.", ephemeral=True)
                 return
             selected_task_id = int(task_select.values[0])
-            result = remove_task_from_db(user_id, selected_task_id)
-            await select_interaction.response.send_message(result)
+            await select_interaction.response.defer()
+            result = await task_repository.remove_task(user_id, selected_task_id)
+            await select_interaction.followup.send(result)
         
         task_select.callback = task_select_callback
-        await interaction.response.send_message("Please select the task you want to remove:", view=view)
+        await interaction.followup.send("Please select the task you want to remove:", view=view)
 
 
-def edit_task_from_db(user_id, task_id, new_task_description):
+def edit_task_from_db(conn, user_id, task_id, new_task_description):
     """Edit a task description by its database ID, verifying ownership."""
-    # Ensure database exists  
-    ensure_db_exists()
-    
-    with sqlite3.connect(str(DB_FILE)) as conn:
-        c = conn.cursor()
-        c.execute("SELECT task FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
-        row = c.fetchone()
-        if row is None:
-            return "Task not found."
-        task_name = row[0]
-        c.execute("UPDATE tasks SET task = ? WHERE id = ? AND user_id = ?", 
-                  (new_task_description, task_id, user_id))
-    
+    c = conn.cursor()
+    c.execute("SELECT task FROM tasks WHERE id = ? AND user_id = ?", (task_id, user_id))
+    row = c.fetchone()
+    if row is None:
+        return "Task not found."
+    task_name = row[0]
+    c.execute("UPDATE tasks SET task = ? WHERE id = ? AND user_id = ?",
+              (new_task_description, task_id, user_id))
+
     return f"Task '{task_name}' has been updated to '{new_task_description}'."
 
 
@@ -321,24 +292,23 @@ class EditTaskModal(discord.ui.Modal, title="Edit Task"):
         self.task_id = task_id
 
     async def on_submit(self, interaction: discord.Interaction):
-        result = edit_task_from_db(self.user_id, self.task_id, self.new_description.value)
-        await interaction.response.send_message(result)
+        await interaction.response.defer(thinking=True)
+        result = await task_repository.edit_task(self.user_id, self.task_id, self.new_description.value)
+        await interaction.followup.send(result)
 
 
 def edit_task(bot: commands.Bot):
     @bot.tree.command(name="edit", description="Edit a task description")
     async def edit_task_(interaction: discord.Interaction):
+        await interaction.response.defer()
         user_id = interaction.user.id
         guild_id = interaction.guild_id or 0
         today = date.today().isoformat()
         
-        # Ensure database exists
-        ensure_db_exists()
-        
-        tasks = get_tasks_by_user(user_id, today, guild_id=guild_id)
+        tasks = await task_repository.get_tasks(user_id, today, guild_id=guild_id)
         
         if not tasks:
-            await interaction.response.send_message("You have no tasks for today.")
+            await interaction.followup.send("You have no tasks for today.")
             return
         
         task_options = _make_task_options(tasks)
@@ -356,4 +326,4 @@ def edit_task(bot: commands.Bot):
             await select_interaction.response.send_modal(modal)
         
         task_select.callback = task_select_callback
-        await interaction.response.send_message("Please select the task you want to edit:", view=view)
+        await interaction.followup.send("Please select the task you want to edit:", view=view)
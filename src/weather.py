@@ -1,30 +1,129 @@
 import os
+import time
 import asyncio
+import logging
 import aiohttp
 import discord
+from collections import OrderedDict
 from discord.ext import commands
 from discord import app_commands
 
+logger = logging.getLogger(__name__)
 
-async def fetch_weather(city):
-    api_key = os.getenv('WEATHER_API')
-    if not api_key:
-        return None, None, None
+# OpenWeatherMap updates current conditions roughly every 10 minutes
+WEATHER_CACHE_TTL = 600
+# Unknown cities stay unknown; remember them longer to save quota
+WEATHER_NEGATIVE_TTL = 3600
+WEATHER_CACHE_SIZE = 1024
+
+
+class CityNotFound(Exception):
+    """Raised when OpenWeatherMap does not know the requested city."""
+
+
+def normalize_city(city):
+    """Normalize a city query so 'Paris, FR' and ' paris,fr ' share a cache entry."""
+    parts = [' '.join(part.split()) for part in city.casefold().split(',')]
+    return ','.join(part for part in parts if part)
+
+
+class WeatherCache:
+    """TTL cache of weather lookups keyed by normalized city, with request coalescing.
+
+    Concurrent lookups of the same city share one API call, and unknown cities are
+    cached as negative results. hits/misses count lookups served from cache or not.
+    """
+    def __init__(self, ttl=WEATHER_CACHE_TTL, negative_ttl=WEATHER_NEGATIVE_TTL, max_entries=WEATHER_CACHE_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # city -> (expires, result or None)
+        self._in_flight = {}  # city -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.coalesced = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'negative_hits': self.negative_hits,
+            'coalesced': self.coalesced,
+            'size': len(self._entries),
+        }
+
+    def _put(self, key, result, ttl):
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key, fetch):
+        """Return the cached result for key, or await fetch() once for all concurrent callers."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            if entry[1] is None:
+                self.negative_hits += 1
+            return entry[1]
+        self.misses += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, key, fetch):
+        try:
+            result = await fetch()
+        except CityNotFound:
+            self._put(key, None, self.negative_ttl)
+            return None
+        # Transient failures (None) are not cached so the next request retries
+        if result is not None:
+            self._put(key, result, self.ttl)
+        return result
+
+
+weather_cache = WeatherCache()
+
+
+async def _request_weather(http_client, city, api_key):
     url = "https://api.openweathermap.org/data/2.5/weather"
     params = {"q": city, "appid": api_key, "units": "metric"}
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            async with session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    weather_description = data['weather'][0]['description']
-                    temperature = data['main']['temp']
-                    humidity = data['main']['humidity']
-                    return weather_description, temperature, humidity
-                else:
-                    return None, None, None
+        async with http_client.get(url, params=params) as response:
+            if response.status == 200:
+                data = await response.json()
+                weather_description = data['weather'][0]['description']
+                temperature = data['main']['temp']
+                humidity = data['main']['humidity']
+                return weather_description, temperature, humidity
+            elif response.status == 404:
+                raise CityNotFound(city)
+            else:
+                return None
     except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+
+async def fetch_weather(http_client, city):
+    api_key = os.getenv('WEATHER_API')
+    if not api_key:
+        return None, None, None
+    key = normalize_city(city)
+    if not key:
+        return None, None, None
+    result = await weather_cache.get(key, lambda: _request_weather(http_client, key, api_key))
+    logger.debug(f"fetch_weather: {weather_cache.stats()}")
+    if result is None:
         return None, None, None
+    return result
 
 
 def get_weather(bot: commands.Bot):
@@ -32,7 +131,7 @@ def get_weather(bot: commands.Bot):
     @app_commands.describe(city="City name")
     async def weather(interaction: discord.Interaction, city: str):
         await interaction.response.defer()
-        weather_description, temperature, humidity = await fetch_weather(city)
+        weather_description, temperature, humidity = await fetch_weather(bot.http_client, city)
         if weather_description is not None:
             weather_details = f"Weather Information for **{city}**:\n\n**Temperature:** {temperature}°C\n**Description:** {weather_description}\n**Humidity:** {humidity}%"
             await interaction.followup.send(weather_details)